@@ -2,4 +2,6 @@
 
 from media_analyzer.cli import main
 
-main()
+# Guarded so spawned scan worker processes don't re-run the CLI on import
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
 """Session and optional API key middleware for Flask."""
 
+import hmac
+
 from flask import jsonify, request, session
 
 
@@ -11,27 +13,27 @@ def init_auth(app, config):
     if not secret_token:
         return  # No API key configured — all requests pass through
 
+    secret_token_bytes = secret_token.encode()
+
+    def token_matches(provided: str | None) -> bool:
+        # Constant-time comparison so response timing doesn't leak the token
+        return bool(provided) and hmac.compare_digest(provided.encode(), secret_token_bytes)
+
     @app.before_request
     def check_api_key():
-        # Skip auth for static files and the root page
-        if request.path.startswith("/static"):
+        # Skip auth for static files and the favicon
+        if request.path.startswith("/static") or request.path == "/favicon.ico":
             return None
 
         # Check session first (browser users who already authenticated)
         if session.get("authenticated"):
             return None
 
-        # Check API key header
-        provided = request.headers.get("X-API-Key")
-        if provided == secret_token:
-            session["authenticated"] = True
-            return None
-
-        # Check query param (for initial browser access)
-        provided = request.args.get("token")
-        if provided == secret_token:
-            session["authenticated"] = True
-            return None
+        # Check API key header, then query param (for initial browser access)
+        for provided in (request.headers.get("X-API-Key"), request.args.get("token")):
+            if token_matches(provided):
+                session["authenticated"] = True
+                return None
 
         return jsonify({"error": "Unauthorized. Provide X-API-Key header or ?token= param."}), 401
 
@@ -60,14 +60,17 @@ def main():
         print(f"WARNING: {w}", file=sys.stderr)
 
     if args.command == "serve":
-        from media_analyzer.server.app import create_app
+        from media_analyzer.server.app import create_app, shutdown_scans
 
         app = create_app(config)
         print(
             f"Starting Media Analyzer on http://{config['server']['host']}:{config['server']['port']}"
         )
-        app.run(
-            host=config["server"]["host"],
-            port=config["server"]["port"],
-            debug=False,
-        )
+        try:
+            app.run(
+                host=config["server"]["host"],
+                port=config["server"]["port"],
+                debug=False,
+            )
+        finally:
+            shutdown_scans(app)
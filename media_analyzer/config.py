@@ -1,11 +1,22 @@
 """Load, save, and validate configuration from config.yaml."""
 
+import copy
+import functools
 import os
 import secrets
 from pathlib import Path
 
 import yaml
 
+# Prefer the libyaml-backed C loader/dumper; fall back to pure Python when
+# PyYAML was built without libyaml.
+try:
+    from yaml import CSafeDumper as _Dumper
+    from yaml import CSafeLoader as _Loader
+except ImportError:
+    from yaml import SafeDumper as _Dumper
+    from yaml import SafeLoader as _Loader
+
 DEFAULT_CONFIG = {
     "scan_dirs": [],
     "server": {
@@ -18,6 +29,16 @@ DEFAULT_CONFIG = {
         "video": [".mp4", ".mkv", ".avi", ".mov", ".m4v"],
         "audio": [".mp3", ".aac", ".flac", ".wav", ".ogg", ".wma", ".m4a", ".opus"],
     },
+    # Directory names the scanner never descends into (hidden directories,
+    # such as .git or .Trash, are always skipped)
+    "scan_excludes": [
+        "node_modules",
+        "__pycache__",
+        "@eaDir",
+        "$RECYCLE.BIN",
+        "System Volume Information",
+        "lost+found",
+    ],
 }
 
 
@@ -30,26 +51,38 @@ def _find_config_path() -> Path:
 
 
 def _deep_merge(base: dict, override: dict) -> dict:
-    """Merge override into base recursively."""
-    result = base.copy()
-    for key, value in override.items():
-        if key in result and isinstance(result[key], dict) and isinstance(value, dict):
-            result[key] = _deep_merge(result[key], value)
-        else:
-            result[key] = value
+    """Merge override into a deep copy of base, nested dicts included."""
+    result = copy.deepcopy(base)
+    stack = [(result, override)]
+    while stack:
+        dst, src = stack.pop()
+        for key, value in src.items():
+            if isinstance(value, dict) and isinstance(dst.get(key), dict):
+                stack.append((dst[key], value))
+            else:
+                dst[key] = value
     return result
 
 
+@functools.lru_cache(maxsize=8)
+def _parse_config_file(path: str, mtime_ns: int, size: int) -> dict:
+    """Parse a config file once per (path, mtime, size); callers must copy the result."""
+    with open(path) as f:
+        return yaml.load(f, Loader=_Loader) or {}
+
+
 def load_config(config_path: Path | None = None) -> dict:
     """Load config from YAML file, merged with defaults."""
     if config_path is None:
         config_path = _find_config_path()
 
-    config = DEFAULT_CONFIG.copy()
+    user_config = {}
     if config_path.exists():
-        with open(config_path) as f:
-            user_config = yaml.safe_load(f) or {}
-        config = _deep_merge(DEFAULT_CONFIG, user_config)
+        stat = config_path.stat()
+        user_config = copy.deepcopy(
+            _parse_config_file(str(config_path), stat.st_mtime_ns, stat.st_size)
+        )
+    config = _deep_merge(DEFAULT_CONFIG, user_config)
 
     # Resolve db_path relative to config file location
     db_path = Path(config["db_path"])
@@ -58,10 +91,11 @@ def load_config(config_path: Path | None = None) -> dict:
     db_path.parent.mkdir(parents=True, exist_ok=True)
     config["db_path"] = str(db_path)
 
-    # Normalize scan_dirs: null, missing, or bare string → list
-    scan_dirs = config.get("scan_dirs")
-    if not isinstance(scan_dirs, list):
-        config["scan_dirs"] = [scan_dirs] if isinstance(scan_dirs, str) else []
+    # Normalize scan_dirs and scan_excludes: null, missing, or bare string → list
+    for key in ("scan_dirs", "scan_excludes"):
+        value = config.get(key)
+        if not isinstance(value, list):
+            config[key] = [value] if isinstance(value, str) else []
 
     return config
 
@@ -80,7 +114,19 @@ def save_config(config: dict, config_path: Path | None = None) -> None:
         pass  # Keep absolute path
 
     with open(config_path, "w") as f:
-        yaml.dump(save_data, f, default_flow_style=False, sort_keys=False)
+        yaml.dump(save_data, f, Dumper=_Dumper, default_flow_style=False, sort_keys=False)
+
+
+def media_extensions(config: dict) -> dict[str, frozenset[str]]:
+    """Map each media category to its lower-cased file extensions.
+
+    The config itself keeps plain lists so it can still be saved as YAML and
+    served as JSON; use this for membership tests.
+    """
+    return {
+        category: frozenset(ext.lower() for ext in exts or ())
+        for category, exts in (config.get("file_extensions") or {}).items()
+    }
 
 
 def generate_secret_token() -> str:
@@ -1,9 +1,20 @@
 """SQLite database layer for media file metadata."""
 
+import functools
 import sqlite3
+import threading
+from collections import OrderedDict
+from collections.abc import Iterator
+from contextlib import contextmanager
 from datetime import UTC, datetime
 from pathlib import Path
 
+# UPSERT ... RETURNING needs SQLite 3.35+
+_HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+# Distinct list_files filter combinations whose match count is remembered
+_COUNT_CACHE_SIZE = 256
+
 SCHEMA_SQL = """
 CREATE TABLE IF NOT EXISTS media_files (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -74,34 +85,203 @@ CREATE TABLE IF NOT EXISTS scan_history (
 
 CREATE INDEX IF NOT EXISTS idx_media_files_type ON media_files(media_type);
 CREATE INDEX IF NOT EXISTS idx_media_files_path ON media_files(file_path);
+CREATE INDEX IF NOT EXISTS idx_media_files_path_size_mod
+    ON media_files(file_path, file_size, modified_date);
+CREATE INDEX IF NOT EXISTS idx_video_height ON video_metadata(height);
+CREATE INDEX IF NOT EXISTS idx_video_res_label ON video_metadata(resolution_label);
+CREATE INDEX IF NOT EXISTS idx_video_video_codec ON video_metadata(video_codec);
+CREATE INDEX IF NOT EXISTS idx_video_audio_codec ON video_metadata(audio_codec);
+CREATE INDEX IF NOT EXISTS idx_audio_lossless ON audio_metadata(is_lossless);
 """
 
+# WHERE fragments for list_files, one bit per filter in the SQL cache key
+_LIST_FILTERS = (
+    "m.media_type = ?",
+    "m.filename LIKE ?",
+    "(v.video_codec = ? OR v.audio_codec = ?)",
+    "v.height >= ?",
+    "v.resolution_label = ?",
+    "a.is_lossless = ?",
+)
+
+
+def _where_sql(mask: int) -> str:
+    clauses = [sql for bit, sql in enumerate(_LIST_FILTERS) if mask & (1 << bit)]
+    return " AND ".join(clauses) if clauses else "1=1"
+
+
+@functools.cache
+def _list_files_sql(mask: int, sort: str, order: str, with_total: bool) -> str:
+    """Build the list_files page query once per filter/sort combination.
+
+    Identical SQL text also lets sqlite3 reuse its per-connection prepared
+    statement instead of re-parsing the query.
+    """
+    total_sql = ", COUNT(*) OVER () AS _total" if with_total else ""
+    return f"""SELECT m.*, v.width, v.height, v.resolution_label,
+                      v.video_codec, v.audio_codec, v.video_bitrate,
+                      v.frame_rate, v.bitrate_per_pixel,
+                      vr.is_vr, vr.vr_format, vr.stereo_mode,
+                      vr.projection_type, vr.spherical, vr.fov,
+                      vr.per_eye_width, vr.per_eye_height,
+                      vr.metadata_completeness,
+                      a.artist, a.album, a.title as audio_title,
+                      a.sample_rate, a.channels, a.is_lossless{total_sql}
+               FROM media_files m
+               LEFT JOIN video_metadata v ON m.id = v.file_id
+               LEFT JOIN vr_metadata vr ON m.id = vr.file_id
+               LEFT JOIN audio_metadata a ON m.id = a.file_id
+               WHERE {_where_sql(mask)}
+               ORDER BY m.{sort} {order}
+               LIMIT ? OFFSET ?"""
+
+
+@functools.cache
+def _count_files_sql(mask: int) -> str:
+    return f"""SELECT COUNT(*) as total FROM media_files m
+               LEFT JOIN video_metadata v ON m.id = v.file_id
+               LEFT JOIN audio_metadata a ON m.id = a.file_id
+               WHERE {_where_sql(mask)}"""
+
 
 class Database:
     def __init__(self, db_path: str):
         self.db_path = db_path
+        self._local = threading.local()
+        # Owning thread -> connection, so connections of finished threads
+        # (e.g. one per request or per scan) can be closed
+        self._connections: dict[threading.Thread, sqlite3.Connection] = {}
+        self._connections_lock = threading.Lock()
+        # Bumped after every committed write; list_files counts cached under an
+        # older epoch are never served again
+        self._write_epoch = 0
+        self._count_cache: OrderedDict[tuple, int] = OrderedDict()
+        self._count_cache_lock = threading.Lock()
         Path(db_path).parent.mkdir(parents=True, exist_ok=True)
         self._init_schema()
 
-    def _connect(self) -> sqlite3.Connection:
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        conn.execute("PRAGMA journal_mode=WAL")
-        conn.execute("PRAGMA foreign_keys=ON")
+    def _conn(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            # WAL makes synchronous=NORMAL durable across application crashes
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA temp_store=MEMORY")
+            conn.execute("PRAGMA cache_size=-64000")  # 64 MB page cache
+            conn.execute("PRAGMA mmap_size=268435456")  # 256 MB
+            conn.execute("PRAGMA busy_timeout=5000")
+            conn.execute("PRAGMA wal_autocheckpoint=1000")
+            self._local.conn = conn
+            with self._connections_lock:
+                dead = [t for t in self._connections if not t.is_alive()]
+                for thread in dead:
+                    self._connections.pop(thread).close()
+                self._connections[threading.current_thread()] = conn
         return conn
 
+    def close(self):
+        """Close every connection opened by this instance."""
+        with self._connections_lock:
+            connections, self._connections = self._connections, {}
+        for conn in connections.values():
+            conn.close()
+        self._local = threading.local()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Yield this thread's connection inside a transaction.
+
+        Inside batch(), statements join the open batch transaction instead of
+        committing on their own.
+        """
+        conn = self._conn()
+        if getattr(self._local, "in_batch", False):
+            yield conn
+            return
+        changes = conn.total_changes
+        with conn:
+            yield conn
+        if conn.total_changes != changes:
+            self._write_epoch += 1
+
+    @contextmanager
+    def batch(self) -> Iterator[sqlite3.Connection]:
+        """Group every write made on this thread into one transaction.
+
+        Commits when the block exits, or rolls everything back if it raises.
+        A nested batch runs as a savepoint: if it raises, only its own writes
+        are rolled back and the outer batch carries on.
+        """
+        if getattr(self._local, "in_batch", False):
+            conn = self._conn()
+            conn.execute("SAVEPOINT nested_batch")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK TO nested_batch")
+                raise
+            finally:
+                conn.execute("RELEASE nested_batch")
+            return
+        conn = self._conn()
+        changes = conn.total_changes
+        self._local.in_batch = True
+        try:
+            with conn:
+                # Begin explicitly so a leading savepoint can't start (and
+                # then commit) a transaction of its own. IMMEDIATE takes the
+                # write lock up front, so the batch waits on busy_timeout
+                # instead of failing to upgrade a read lock mid-batch.
+                conn.execute("BEGIN IMMEDIATE")
+                yield conn
+        finally:
+            self._local.in_batch = False
+        if conn.total_changes != changes:
+            self._write_epoch += 1
+
+    def _cached_count(self, key: tuple) -> int | None:
+        with self._count_cache_lock:
+            total = self._count_cache.get(key)
+            if total is not None:
+                self._count_cache.move_to_end(key)
+            return total
+
+    def _store_count(self, key: tuple, total: int):
+        with self._count_cache_lock:
+            self._count_cache[key] = total
+            self._count_cache.move_to_end(key)
+            if len(self._count_cache) > _COUNT_CACHE_SIZE:
+                self._count_cache.popitem(last=False)
+
     def _init_schema(self):
-        with self._connect() as conn:
+        with self._transaction() as conn:
             conn.executescript(SCHEMA_SQL)
+        self.optimize()
+
+    def optimize(self):
+        """Refresh query planner statistics so the filter indexes get used.
+
+        Runs a full ANALYZE until statistics exist for populated tables (an
+        ANALYZE of empty tables records nothing), then leaves it to PRAGMA
+        optimize to re-analyze only tables that have changed enough.
+        """
+        with self._transaction() as conn:
+            has_stats = (
+                conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone()
+                and conn.execute("SELECT 1 FROM sqlite_stat1 LIMIT 1").fetchone()
+            )
+            conn.execute("PRAGMA optimize" if has_stats else "ANALYZE")
 
     # --- Upsert ---
 
     def upsert_media_file(self, data: dict) -> int:
         """Insert or update a media file record. Returns the file id."""
         now = datetime.now(UTC).isoformat()
-        with self._connect() as conn:
-            cursor = conn.execute(
-                """INSERT INTO media_files
+        sql = """INSERT INTO media_files
                    (file_path, filename, file_size, modified_date, media_type,
                     container_format, duration, bitrate, scan_date)
                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
@@ -113,8 +293,12 @@ class Database:
                     container_format=excluded.container_format,
                     duration=excluded.duration,
                     bitrate=excluded.bitrate,
-                    scan_date=excluded.scan_date
-                """,
+                    scan_date=excluded.scan_date"""
+        if _HAS_RETURNING:
+            sql += " RETURNING id"
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                sql,
                 (
                     data["file_path"],
                     data["filename"],
@@ -127,18 +311,18 @@ class Database:
                     now,
                 ),
             )
-            file_id = cursor.lastrowid
-            # If updated, lastrowid is 0; fetch actual id
-            if file_id == 0:
-                row = conn.execute(
-                    "SELECT id FROM media_files WHERE file_path = ?",
-                    (data["file_path"],),
-                ).fetchone()
-                file_id = row["id"]
-            return file_id
+            if _HAS_RETURNING:
+                return cursor.fetchone()[0]
+            # lastrowid is stale after the update path on a reused connection,
+            # so look the id up explicitly
+            row = conn.execute(
+                "SELECT id FROM media_files WHERE file_path = ?",
+                (data["file_path"],),
+            ).fetchone()
+            return row["id"]
 
     def upsert_video_metadata(self, file_id: int, data: dict):
-        with self._connect() as conn:
+        with self._transaction() as conn:
             conn.execute(
                 """INSERT INTO video_metadata
                    (file_id, width, height, resolution_label, frame_rate,
@@ -174,7 +358,7 @@ class Database:
             )
 
     def upsert_vr_metadata(self, file_id: int, data: dict):
-        with self._connect() as conn:
+        with self._transaction() as conn:
             conn.execute(
                 """INSERT INTO vr_metadata
                    (file_id, is_vr, vr_format, stereo_mode, projection_type,
@@ -207,7 +391,7 @@ class Database:
             )
 
     def upsert_audio_metadata(self, file_id: int, data: dict):
-        with self._connect() as conn:
+        with self._transaction() as conn:
             conn.execute(
                 """INSERT INTO audio_metadata
                    (file_id, sample_rate, bit_depth, channels, audio_bitrate,
@@ -243,7 +427,7 @@ class Database:
 
     def start_scan(self) -> int:
         now = datetime.now(UTC).isoformat()
-        with self._connect() as conn:
+        with self._transaction() as conn:
             cursor = conn.execute(
                 "INSERT INTO scan_history (started_at, status) VALUES (?, 'running')",
                 (now,),
@@ -252,7 +436,7 @@ class Database:
 
     def finish_scan(self, scan_id: int, files_scanned: int, files_new: int, files_updated: int):
         now = datetime.now(UTC).isoformat()
-        with self._connect() as conn:
+        with self._transaction() as conn:
             conn.execute(
                 """UPDATE scan_history
                    SET finished_at=?, files_scanned=?, files_new=?,
@@ -263,7 +447,7 @@ class Database:
 
     def fail_scan(self, scan_id: int, files_scanned: int):
         now = datetime.now(UTC).isoformat()
-        with self._connect() as conn:
+        with self._transaction() as conn:
             conn.execute(
                 """UPDATE scan_history
                    SET finished_at=?, files_scanned=?, status='failed'
@@ -275,13 +459,39 @@ class Database:
 
     def file_unchanged(self, file_path: str, file_size: int, modified_date: str) -> bool:
         """Check if a file already exists with matching size and modified date."""
-        with self._connect() as conn:
+        with self._transaction() as conn:
             row = conn.execute(
                 "SELECT 1 FROM media_files WHERE file_path=? AND file_size=? AND modified_date=?",
                 (file_path, file_size, modified_date),
             ).fetchone()
             return row is not None
 
+    def fetch_file_fingerprints(
+        self, scan_dirs: list[str] | None = None
+    ) -> dict[str, tuple[int, str]]:
+        """Map file_path to (file_size, modified_date) for every stored file.
+
+        With scan_dirs, only files under those directories are loaded.
+        """
+        if scan_dirs is None:
+            ranges = [("", "\U0010ffff")]
+        else:
+            # Range scans on the file_path index: every path under the prefix
+            # sorts between prefix and prefix + the highest code point
+            prefixes = {scan_dir.rstrip("/") + "/" for scan_dir in scan_dirs}
+            ranges = [(prefix, prefix + "\U0010ffff") for prefix in prefixes]
+        fingerprints = {}
+        with self._transaction() as conn:
+            for low, high in ranges:
+                rows = conn.execute(
+                    "SELECT file_path, file_size, modified_date FROM media_files"
+                    " WHERE file_path >= ? AND file_path < ?",
+                    (low, high),
+                )
+                for file_path, file_size, modified_date in rows:
+                    fingerprints[file_path] = (file_size, modified_date)
+        return fingerprints
+
     def list_files(
         self,
         media_type: str | None = None,
@@ -310,63 +520,59 @@ class Database:
         if order not in ("asc", "desc"):
             order = "asc"
 
-        where_clauses = []
+        # Bit positions follow _LIST_FILTERS
+        mask = 0
         params: list = []
 
         if media_type:
-            where_clauses.append("m.media_type = ?")
+            mask |= 1 << 0
             params.append(media_type)
         if search:
-            where_clauses.append("m.filename LIKE ?")
+            mask |= 1 << 1
             params.append(f"%{search}%")
         if codec:
-            where_clauses.append("(v.video_codec = ? OR v.audio_codec = ?)")
+            mask |= 1 << 2
             params.extend([codec, codec])
         if resolution_min:
-            where_clauses.append("v.height >= ?")
+            mask |= 1 << 3
             params.append(resolution_min)
         if resolution_label:
-            where_clauses.append("v.resolution_label = ?")
+            mask |= 1 << 4
             params.append(resolution_label)
         if lossless is not None:
-            where_clauses.append("a.is_lossless = ?")
+            mask |= 1 << 5
             params.append(lossless)
 
-        where_sql = " AND ".join(where_clauses) if where_clauses else "1=1"
         offset = (page - 1) * per_page
 
-        with self._connect() as conn:
-            count_row = conn.execute(
-                f"""SELECT COUNT(*) as total FROM media_files m
-                    LEFT JOIN video_metadata v ON m.id = v.file_id
-                    LEFT JOIN audio_metadata a ON m.id = a.file_id
-                    WHERE {where_sql}""",
-                params,
-            ).fetchone()
-            total = count_row["total"]
+        # Paging through the same filter reuses its count until the next write
+        count_key = (mask, tuple(params), self._write_epoch)
+        total = self._cached_count(count_key)
 
+        with self._transaction() as conn:
             rows = conn.execute(
-                f"""SELECT m.*, v.width, v.height, v.resolution_label,
-                           v.video_codec, v.audio_codec, v.video_bitrate,
-                           v.frame_rate, v.bitrate_per_pixel,
-                           vr.is_vr, vr.vr_format, vr.stereo_mode,
-                           vr.projection_type, vr.spherical, vr.fov,
-                           vr.per_eye_width, vr.per_eye_height,
-                           vr.metadata_completeness,
-                           a.artist, a.album, a.title as audio_title,
-                           a.sample_rate, a.channels, a.is_lossless
-                    FROM media_files m
-                    LEFT JOIN video_metadata v ON m.id = v.file_id
-                    LEFT JOIN vr_metadata vr ON m.id = vr.file_id
-                    LEFT JOIN audio_metadata a ON m.id = a.file_id
-                    WHERE {where_sql}
-                    ORDER BY m.{sort} {order}
-                    LIMIT ? OFFSET ?""",
+                _list_files_sql(mask, sort, order, total is None),
                 params + [per_page, offset],
             ).fetchall()
 
+            files = [dict(r) for r in rows]
+            if total is None:
+                for f in files:
+                    del f["_total"]
+                if rows:
+                    total = rows[0]["_total"]
+                    self._store_count(count_key, total)
+                elif offset or per_page <= 0:
+                    # Page past the end, or a LIMIT that returns no rows: the
+                    # window count has no row to ride on
+                    total = conn.execute(_count_files_sql(mask), params).fetchone()["total"]
+                    self._store_count(count_key, total)
+                else:
+                    # No rows at offset 0 under a positive LIMIT: nothing matches
+                    total = 0
+
             return {
-                "files": [dict(r) for r in rows],
+                "files": files,
                 "total": total,
                 "page": page,
                 "per_page": per_page,
@@ -374,9 +580,21 @@ class Database:
             }
 
     def get_file_detail(self, file_id: int) -> dict | None:
-        with self._connect() as conn:
+        with self._transaction() as conn:
             row = conn.execute(
-                """SELECT m.*, v.*, vr.*, a.*
+                """SELECT m.id, m.file_path, m.filename, m.file_size, m.modified_date,
+                          m.media_type, m.container_format, m.duration, m.bitrate,
+                          m.scan_date,
+                          v.width, v.height, v.resolution_label, v.frame_rate,
+                          v.pixel_format, v.color_space, v.video_bitrate,
+                          v.video_codec, v.audio_codec,
+                          COALESCE(v.audio_bitrate, a.audio_bitrate) AS audio_bitrate,
+                          v.bitrate_per_pixel,
+                          vr.is_vr, vr.vr_format, vr.stereo_mode, vr.projection_type,
+                          vr.spherical, vr.fov, vr.per_eye_width, vr.per_eye_height,
+                          vr.per_eye_bitrate, vr.metadata_completeness,
+                          a.sample_rate, a.bit_depth, a.channels, a.is_lossless,
+                          a.title, a.artist, a.album, a.genre, a.year, a.track_number
                    FROM media_files m
                    LEFT JOIN video_metadata v ON m.id = v.file_id
                    LEFT JOIN vr_metadata vr ON m.id = vr.file_id
@@ -387,7 +605,7 @@ class Database:
             return dict(row) if row else None
 
     def get_scan_stats(self) -> dict:
-        with self._connect() as conn:
+        with self._transaction() as conn:
             total = conn.execute("SELECT COUNT(*) as c FROM media_files").fetchone()["c"]
             by_type = conn.execute(
                 "SELECT media_type, COUNT(*) as c FROM media_files GROUP BY media_type"
@@ -407,7 +625,7 @@ class Database:
             }
 
     def get_running_scan(self) -> dict | None:
-        with self._connect() as conn:
+        with self._transaction() as conn:
             row = conn.execute(
                 "SELECT * FROM scan_history WHERE status='running' ORDER BY id DESC LIMIT 1"
             ).fetchone()
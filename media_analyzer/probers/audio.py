@@ -8,55 +8,40 @@ LOSSLESS_CODECS = {"flac", "alac", "wavpack", "ape", "tak", "pcm_s16le", "pcm_s2
 class AudioProber(BaseProber):
     supported_extensions = {".mp3", ".aac", ".flac", ".wav", ".ogg", ".wma", ".m4a", ".opus"}
 
+    show_entries = (
+        "stream=codec_type,codec_name,sample_rate,bits_per_raw_sample,channels,bit_rate"
+        ":format=duration,bit_rate,format_name"
+        ":format_tags=title,artist,album,genre,date,track"
+    )
+
     def probe(self, file_path: str) -> dict | None:
-        # Get audio stream info
+        # Stream, format, and tag info in a single ffprobe run
         data = self._run_ffprobe(
-            [
-                "-select_streams",
-                "a:0",
-                "-show_entries",
-                "stream=codec_name,sample_rate,bits_per_raw_sample,channels,bit_rate",
-            ],
+            ["-select_streams", "a:0", "-show_entries", self.show_entries],
             file_path,
         )
-        if not data or not data.get("streams"):
+        if not data:
+            return None
+        stream = self._first_stream(data, "audio")
+        if stream is None:
             return None
 
-        stream = data["streams"][0]
         codec = stream.get("codec_name")
         sample_rate = self._parse_int(stream.get("sample_rate"))
         bit_depth = self._parse_int(stream.get("bits_per_raw_sample"))
         channels = self._parse_int(stream.get("channels"))
         audio_bitrate = self._parse_int(stream.get("bit_rate"))
 
-        # Get format-level info
-        fmt_data = self._run_ffprobe(
-            ["-show_entries", "format=duration,bit_rate,format_name"],
-            file_path,
-        )
-        duration = None
-        overall_bitrate = None
-        container_format = None
-        if fmt_data and fmt_data.get("format"):
-            fmt = fmt_data["format"]
-            duration = self._parse_float(fmt.get("duration"))
-            overall_bitrate = self._parse_int(fmt.get("bit_rate"))
-            container_format = fmt.get("format_name")
+        fmt = data.get("format") or {}
+        duration = self._parse_float(fmt.get("duration"))
+        overall_bitrate = self._parse_int(fmt.get("bit_rate"))
+        container_format = fmt.get("format_name")
 
         if not audio_bitrate:
             audio_bitrate = overall_bitrate
 
-        # Get tags
-        tag_data = self._run_ffprobe(
-            ["-show_entries", "format_tags=title,artist,album,genre,date,track"],
-            file_path,
-        )
-        tags = {}
-        if tag_data and tag_data.get("format") and tag_data["format"].get("tags"):
-            raw_tags = tag_data["format"]["tags"]
-            # Tags can be mixed case
-            for key, value in raw_tags.items():
-                tags[key.lower()] = value
+        # Tags can be mixed case
+        tags = {key.lower(): value for key, value in (fmt.get("tags") or {}).items()}
 
         is_lossless = codec in LOSSLESS_CODECS if codec else False
 
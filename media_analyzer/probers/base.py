@@ -5,8 +5,44 @@ import logging
 import subprocess
 from abc import ABC, abstractmethod
 
+try:
+    import av
+except ImportError:  # PyAV is optional; probers fall back to the ffprobe CLI
+    av = None
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; ffprobe output is parsed with stdlib json
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
+# Seconds before a hung probe (e.g. on a stalled network mount) is abandoned:
+# ffprobe is killed, and PyAV gives up waiting for data
+FFPROBE_TIMEOUT = 60
+
+# Both accept the raw bytes, skipping a separate decode step
+_json_loads = orjson.loads if orjson is not None else json.loads
+
+# ffprobe's names for libavutil AVColorSpace values, indexed by enum value
+_COLOR_SPACE_NAMES = (
+    "gbr",
+    "bt709",
+    None,  # unspecified
+    "reserved",
+    "fcc",
+    "bt470bg",
+    "smpte170m",
+    "smpte240m",
+    "ycgco",
+    "bt2020nc",
+    "bt2020c",
+    "smpte2085",
+    "chroma-derived-nc",
+    "chroma-derived-c",
+    "ictcp",
+)
+
 
 class BaseProber(ABC):
     supported_extensions: set[str] = set()
@@ -19,18 +55,75 @@ class BaseProber(ABC):
         """Run ffprobe with the given arguments and return parsed JSON output."""
         cmd = ["ffprobe", "-v", "error"] + args + ["-of", "json", file_path]
         try:
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-            return json.loads(result.stdout)
-        except (subprocess.CalledProcessError, json.JSONDecodeError) as e:
+            result = subprocess.run(cmd, capture_output=True, check=True, timeout=FFPROBE_TIMEOUT)
+            return _json_loads(result.stdout)
+        except (
+            subprocess.CalledProcessError,
+            subprocess.TimeoutExpired,
+            ValueError,  # JSONDecodeError, or UnicodeDecodeError on non-UTF-8 output
+        ) as e:
             logger.warning("ffprobe failed for %s: %s", file_path, e)
             return None
 
-    def _run_ffprobe_raw(self, args: list[str], file_path: str) -> str | None:
-        """Run ffprobe and return raw stdout text."""
-        cmd = ["ffprobe", "-v", "error"] + args + [file_path]
+    def _probe_av(self, file_path: str) -> dict | None:
+        """Read container headers in-process with PyAV.
+
+        Returns the same {"streams": [...], "format": {...}} shape as ffprobe's
+        JSON output, or None if PyAV is unavailable, cannot open the file, or
+        has no decoder for one of its audio or video streams.
+        """
+        if av is None:
+            return None
         try:
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-            return result.stdout.strip()
-        except subprocess.CalledProcessError as e:
-            logger.warning("ffprobe failed for %s: %s", file_path, e)
+            with av.open(file_path, timeout=FFPROBE_TIMEOUT) as container:
+                # codec_context is None without a decoder, and it is the only
+                # source of codec name, dimensions and pixel format
+                if any(
+                    stream.type in ("audio", "video") and stream.codec_context is None
+                    for stream in container.streams
+                ):
+                    logger.debug("PyAV has no decoder for a stream in %s", file_path)
+                    return None
+                streams = [self._av_stream_info(stream) for stream in container.streams]
+                fmt = {
+                    "format_name": container.format.name,
+                    "duration": container.duration / av.time_base if container.duration else None,
+                    "bit_rate": container.bit_rate or None,
+                    "tags": dict(container.metadata),
+                }
+        except (av.FFmpegError, OSError, ValueError) as e:
+            logger.debug("PyAV could not open %s: %s", file_path, e)
             return None
+        return {"streams": streams, "format": fmt}
+
+    @staticmethod
+    def _av_stream_info(stream) -> dict:
+        ctx = stream.codec_context
+        info = {
+            "codec_type": stream.type,
+            # Codec (not decoder) name, as ffprobe reports it: "mp3", not "mp3float"
+            "codec_name": ctx.codec.canonical_name if ctx else None,
+            "bit_rate": (ctx.bit_rate or None) if ctx else None,
+            "tags": dict(stream.metadata),
+        }
+        if stream.type == "video" and ctx:
+            rate = stream.base_rate
+            colorspace = ctx.colorspace
+            info.update(
+                width=ctx.width,
+                height=ctx.height,
+                r_frame_rate=f"{rate.numerator}/{rate.denominator}" if rate else None,
+                pix_fmt=ctx.pix_fmt,
+                color_space=_COLOR_SPACE_NAMES[colorspace]
+                if 0 <= colorspace < len(_COLOR_SPACE_NAMES)
+                else None,
+            )
+        return info
+
+    @staticmethod
+    def _first_stream(data: dict, codec_type: str) -> dict | None:
+        """Return the first stream of the given codec_type from ffprobe output."""
+        for stream in data.get("streams") or []:
+            if stream.get("codec_type") == codec_type:
+                return stream
+        return None
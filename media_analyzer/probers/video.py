@@ -1,8 +1,13 @@
 """Video file prober using ffprobe."""
 
+import functools
+
 from media_analyzer.probers.base import BaseProber
 
 
+# Both helpers see only a handful of distinct heights and frame rate strings
+# across a library, so cache the parsed results
+@functools.lru_cache(maxsize=128)
 def _resolution_label(height: int) -> str:
     """Map height to a human-readable resolution label."""
     if height >= 4320:
@@ -22,6 +27,7 @@ def _resolution_label(height: int) -> str:
     return f"{height}p"
 
 
+@functools.lru_cache(maxsize=128)
 def _parse_frame_rate(rate_str: str | None) -> float | None:
     """Parse frame rate string like '30/1' or '29.97' to float."""
     if not rate_str:
@@ -42,21 +48,30 @@ def _parse_frame_rate(rate_str: str | None) -> float | None:
 class VideoProber(BaseProber):
     supported_extensions = {".mp4", ".mkv", ".avi", ".mov", ".m4v"}
 
+    # Everything probe() needs, fetched in a single ffprobe run
+    show_entries = (
+        "stream=codec_type,width,height,r_frame_rate,codec_name,pix_fmt,color_space,bit_rate"
+        ":format=duration,bit_rate,format_name"
+    )
+
     def probe(self, file_path: str) -> dict | None:
-        # Get video stream info
-        data = self._run_ffprobe(
-            [
-                "-select_streams",
-                "v:0",
-                "-show_entries",
-                "stream=width,height,r_frame_rate,codec_name,pix_fmt,color_space,bit_rate",
-            ],
-            file_path,
+        data = self._probe_data(file_path)
+        if not data:
+            return None
+        return self._parse(data)
+
+    def _probe_data(self, file_path: str) -> dict | None:
+        """Fetch stream/format data, in-process via PyAV when installed."""
+        return self._probe_av(file_path) or self._run_ffprobe(
+            ["-show_entries", self.show_entries], file_path
         )
-        if not data or not data.get("streams"):
+
+    def _parse(self, data: dict) -> dict | None:
+        """Build the metadata dict from combined ffprobe stream/format output."""
+        stream = self._first_stream(data, "video")
+        if stream is None:
             return None
 
-        stream = data["streams"][0]
         width = int(stream.get("width", 0))
         height = int(stream.get("height", 0))
         if not width or not height:
@@ -68,31 +83,19 @@ class VideoProber(BaseProber):
         color_space = stream.get("color_space")
         video_bitrate = self._parse_int(stream.get("bit_rate"))
 
-        # Get audio stream info
-        audio_data = self._run_ffprobe(
-            ["-select_streams", "a:0", "-show_entries", "stream=codec_name,bit_rate"],
-            file_path,
-        )
+        # First audio stream, if any
         audio_codec = None
         audio_bitrate = None
-        if audio_data and audio_data.get("streams"):
-            a_stream = audio_data["streams"][0]
+        a_stream = self._first_stream(data, "audio")
+        if a_stream:
             audio_codec = a_stream.get("codec_name")
             audio_bitrate = self._parse_int(a_stream.get("bit_rate"))
 
-        # Get format-level info (overall bitrate, duration, container)
-        fmt_data = self._run_ffprobe(
-            ["-show_entries", "format=duration,bit_rate,format_name"],
-            file_path,
-        )
-        duration = None
-        overall_bitrate = None
-        container_format = None
-        if fmt_data and fmt_data.get("format"):
-            fmt = fmt_data["format"]
-            duration = self._parse_float(fmt.get("duration"))
-            overall_bitrate = self._parse_int(fmt.get("bit_rate"))
-            container_format = fmt.get("format_name")
+        # Format-level info (overall bitrate, duration, container)
+        fmt = data.get("format") or {}
+        duration = self._parse_float(fmt.get("duration"))
+        overall_bitrate = self._parse_int(fmt.get("bit_rate"))
+        container_format = fmt.get("format_name")
 
         # If video bitrate not available from stream, estimate from overall
         if not video_bitrate and overall_bitrate and audio_bitrate:
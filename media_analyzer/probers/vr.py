@@ -4,23 +4,34 @@ import re
 
 from media_analyzer.probers.video import VideoProber
 
-# Filename patterns indicating VR content
-VR_FILENAME_PATTERNS = {
-    "180": re.compile(r"[_\-.]180[_\-.]|180x180", re.IGNORECASE),
-    "360": re.compile(r"[_\-.]360[_\-.]", re.IGNORECASE),
-    "sbs": re.compile(r"[_\-.](?:sbs|lr)[_\-.]", re.IGNORECASE),
-    "tb": re.compile(r"[_\-.](?:tb|ou)[_\-.]", re.IGNORECASE),
-    "half_sbs": re.compile(r"[_\-.](?:3dh|half)[_\-.]", re.IGNORECASE),
+# Filename patterns indicating VR content, merged into one regex so each
+# filename is scanned once. Lookarounds keep separators unconsumed, so
+# adjacent tokens like "_180_sbs_" are all found.
+VR_FILENAME_PATTERN = re.compile(
+    r"(?<=[_\-.])"
+    r"(?:(?P<fov180>180)|(?P<fov360>360)|(?P<sbs>sbs|lr)|(?P<tb>tb|ou)|(?P<half_sbs>3dh|half))"
+    r"(?=[_\-.])"
+    r"|(?P<fov180x180>180x180)",
+    re.IGNORECASE,
+)
+
+# Regex group name -> indicator key
+_VR_INDICATOR_KEYS = {
+    "fov180": "180",
+    "fov180x180": "180",
+    "fov360": "360",
+    "sbs": "sbs",
+    "tb": "tb",
+    "half_sbs": "half_sbs",
 }
 
 
 def _detect_vr_from_filename(filename: str) -> dict:
     """Extract VR indicators from filename patterns."""
-    indicators = {}
-    for key, pattern in VR_FILENAME_PATTERNS.items():
-        if pattern.search(filename):
-            indicators[key] = True
-    return indicators
+    return {
+        _VR_INDICATOR_KEYS[match.lastgroup]: True
+        for match in VR_FILENAME_PATTERN.finditer(filename)
+    }
 
 
 def _detect_format_from_ratio(width: int, height: int) -> str | None:
@@ -46,9 +57,16 @@ class VRProber(VideoProber):
     back to plain 'video'.
     """
 
+    show_entries = (
+        VideoProber.show_entries + ":stream_tags=stereo_mode:format_tags=Spherical,ProjectionType"
+    )
+
     def probe(self, file_path: str) -> dict | None:
-        # Get base video metadata first
-        result = super().probe(file_path)
+        # Base video metadata and embedded VR tags come from one ffprobe run
+        data = self._probe_data(file_path)
+        if not data:
+            return None
+        result = self._parse(data)
         if result is None:
             return None
 
@@ -56,31 +74,14 @@ class VRProber(VideoProber):
         width = result["width"]
         height = result["height"]
 
-        # Check embedded VR metadata via ffprobe
-        stereo_mode = self._run_ffprobe_raw(
-            [
-                "-select_streams",
-                "v:0",
-                "-show_entries",
-                "stream_tags=stereo_mode",
-                "-of",
-                "default=noprint_wrappers=1:nokey=1",
-            ],
-            file_path,
-        )
-        spherical_str = self._run_ffprobe_raw(
-            ["-show_entries", "format_tags=Spherical", "-of", "default=noprint_wrappers=1:nokey=1"],
-            file_path,
-        )
-        projection = self._run_ffprobe_raw(
-            [
-                "-show_entries",
-                "format_tags=ProjectionType",
-                "-of",
-                "default=noprint_wrappers=1:nokey=1",
-            ],
-            file_path,
-        )
+        # Embedded VR metadata; tag key case varies between muxers
+        video_tags = (self._first_stream(data, "video") or {}).get("tags") or {}
+        format_tags = (data.get("format") or {}).get("tags") or {}
+        video_tags = {k.lower(): v for k, v in video_tags.items()}
+        format_tags = {k.lower(): v for k, v in format_tags.items()}
+        stereo_mode = video_tags.get("stereo_mode")
+        spherical_str = format_tags.get("spherical")
+        projection = format_tags.get("projectiontype")
 
         spherical = bool(spherical_str and spherical_str.lower() in ("true", "1", "yes"))
         stereo_mode = stereo_mode if stereo_mode else None
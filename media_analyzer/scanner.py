@@ -1,86 +1,436 @@
 """Directory scanner - walks configured dirs, probes files, stores results."""
 
 import logging
+import multiprocessing
 import os
+import queue
 import threading
+import time
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from concurrent.futures.process import BrokenProcessPool
 from datetime import UTC, datetime
 from pathlib import Path
 
+from media_analyzer.config import media_extensions
 from media_analyzer.db import Database
 from media_analyzer.probers.audio import AudioProber
 from media_analyzer.probers.vr import VRProber
 
 logger = logging.getLogger(__name__)
 
+# Scan writes are committed once this many files are written, or once the
+# oldest uncommitted write is this many seconds old
+_WRITE_BATCH_SIZE = 100
+_WRITE_FLUSH_INTERVAL = 1.0
+_WRITER_IDLE = object()
+
+# Files buffered between the directory walkers and the scan loop
+_WALK_QUEUE_SIZE = 1000
+_WALK_DONE = object()
+
 
 class ScanProgress:
-    """Thread-safe scan progress tracker."""
+    """Scan progress tracker.
+
+    The scanning thread writes the counters, current_file, running and
+    scan_id. API request threads write future (when submitting a scan);
+    they and shutdown_scans set cancel_requested, which the scanning thread
+    clears when the scan ends. Single attribute loads and stores are atomic, so readers such as
+    the status endpoint never see a torn value and the per-file update path
+    takes no lock.
+    """
 
     def __init__(self):
-        self._lock = threading.Lock()
         self.total = 0
         self.processed = 0
         self.current_file = ""
         self.running = False
         self.scan_id: int | None = None
         self.cancel_requested = False
+        # Future of the most recently submitted scan, set by the API
+        self.future: Future | None = None
+
+    @property
+    def busy(self) -> bool:
+        """True while a scan is queued or running."""
+        future = self.future
+        return self.running or (future is not None and not future.done())
 
     def to_dict(self) -> dict:
-        with self._lock:
-            return {
-                "running": self.running,
-                "total": self.total,
-                "processed": self.processed,
-                "current_file": self.current_file,
-                "scan_id": self.scan_id,
-                "percent": round(self.processed / self.total * 100, 1) if self.total else 0,
-            }
+        # Snapshot the counters so percent agrees with the reported values
+        total = self.total
+        processed = self.processed
+        future = self.future
+        error = None
+        if future is not None and future.done() and not future.cancelled():
+            exc = future.exception()
+            if exc is not None:
+                error = str(exc)
+        return {
+            "running": self.running,
+            "total": total,
+            "processed": processed,
+            "current_file": self.current_file,
+            "scan_id": self.scan_id,
+            "percent": round(processed / total * 100, 1) if total else 0,
+            "error": error,
+        }
 
     def update(self, processed: int, current_file: str):
-        with self._lock:
-            self.processed = processed
-            self.current_file = current_file
+        self.processed = processed
+        self.current_file = current_file
 
 
 # Global progress instance
 scan_progress = ScanProgress()
 
 
-def _collect_files(scan_dirs: list[str], extensions: dict) -> list[tuple[str, str]]:
-    """Walk directories and collect (file_path, category) tuples.
+def _within(path: str, real_dir: str) -> bool:
+    """Check that path resolves to a location inside the resolved real_dir."""
+    try:
+        real = os.path.realpath(path)
+        return os.path.commonpath([real, real_dir]) == real_dir
+    except (OSError, ValueError):
+        return False
+
 
-    category is 'video' or 'audio' based on extension.
+def _walk_scan_dir(
+    scan_dir: str, ext_categories: dict[str, str], excludes: frozenset[str]
+) -> Iterator[tuple[str, str, int, str]]:
+    """Yield (file_path, category, file_size, modified_date) under one scan directory.
+
+    Size and modification date come from the DirEntry, so files aren't
+    stat'ed a second time later. Like os.walk, symlinked directories are
+    listed but not descended into; neither are hidden directories or ones
+    named in excludes.
+    """
+    real_scan_dir = os.path.realpath(scan_dir)
+    # Bound once: this runs for every file in the tree
+    category_of = ext_categories.get
+    stack = [scan_dir]
+    while stack:
+        dir_path = stack.pop()
+        try:
+            with os.scandir(dir_path) as it:
+                # Inode order approximates on-disk order on ext4 and similar
+                # filesystems, which cuts seeking on spinning disks. inode()
+                # comes from the directory listing itself, not a stat call.
+                entries = sorted(it, key=os.DirEntry.inode)
+        except OSError as e:
+            logger.warning("Cannot read directory %s: %s", dir_path, e)
+            continue
+
+        subdirs = []
+        for entry in entries:
+            name = entry.name
+            try:
+                if entry.is_dir():
+                    if not (entry.is_symlink() or name.startswith(".") or name in excludes):
+                        subdirs.append(entry.path)
+                    continue
+                is_symlink = entry.is_symlink()
+            except OSError as e:
+                # e.g. a symlink loop, which is_dir() follows
+                logger.warning("Cannot read %s: %s", entry.path, e)
+                continue
+            dot = name.rfind(".")
+            # dot == 0 is a dotfile with no extension, as in os.path.splitext
+            if dot <= 0:
+                continue
+            category = category_of(name[dot:].lower())
+            if category is None:
+                continue
+            # Directory symlinks are never followed, so only a file that is
+            # itself a symlink can point outside the configured directory
+            if is_symlink and not _within(entry.path, real_scan_dir):
+                logger.warning("Skipping symlink escape: %s", entry.path)
+                continue
+            try:
+                stat = entry.stat()
+            except OSError as e:
+                logger.warning("Cannot stat %s: %s", entry.path, e)
+                continue
+            modified_date = datetime.fromtimestamp(stat.st_mtime, tz=UTC).isoformat()
+            yield entry.path, category, stat.st_size, modified_date
+        # Reversed so the stack pops subdirectories in inode order too
+        stack.extend(reversed(subdirs))
+
+
+def _collect_files(
+    scan_dirs: list[str],
+    extensions: dict[str, frozenset[str]],
+    excludes: frozenset[str] = frozenset(),
+) -> Iterator[tuple[str, str, int, str]]:
+    """Walk directories and yield (file_path, category, file_size, modified_date).
+
+    Files are yielded as they are found. category is 'video' or 'audio' based
+    on extension. Each scan directory is walked on its own thread so latency
+    on separate mounts overlaps; results from different directories are
+    interleaved.
     """
-    video_exts = set(extensions.get("video", []))
-    audio_exts = set(extensions.get("audio", []))
-    all_exts = video_exts | audio_exts
-    files = []
+    # Extension -> category; video wins if an extension is listed under both
+    ext_categories = dict.fromkeys(extensions.get("audio", ()), "audio")
+    ext_categories.update(dict.fromkeys(extensions.get("video", ()), "video"))
 
+    existing = []
     for scan_dir in scan_dirs:
-        dir_path = Path(scan_dir)
-        if not dir_path.is_dir():
+        if not Path(scan_dir).is_dir():
             logger.warning("Scan directory does not exist: %s", scan_dir)
             continue
-        for root, _dirs, filenames in os.walk(dir_path):
-            for fname in filenames:
-                ext = os.path.splitext(fname)[1].lower()
-                if ext in all_exts:
-                    full_path = os.path.join(root, fname)
-                    # Validate path stays within configured directory
-                    try:
-                        real = os.path.realpath(full_path)
-                        if not real.startswith(os.path.realpath(scan_dir)):
-                            logger.warning("Skipping symlink escape: %s", full_path)
-                            continue
-                    except OSError:
-                        continue
-                    category = "video" if ext in video_exts else "audio"
-                    files.append((full_path, category))
-    return files
-
-
-def run_scan(db: Database, config: dict, override_scan_dirs: list[str] | None = None) -> int:
-    """Execute a full scan. Returns the scan_id."""
+        existing.append(scan_dir)
+    if len(existing) <= 1:
+        for scan_dir in existing:
+            yield from _walk_scan_dir(scan_dir, ext_categories, excludes)
+        return
+
+    # Walker threads hand files over through a bounded queue, so a walk that
+    # runs ahead of probing doesn't buffer the whole library in memory
+    found = queue.Queue(maxsize=_WALK_QUEUE_SIZE)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                found.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def walk(scan_dir: str):
+        try:
+            for item in _walk_scan_dir(scan_dir, ext_categories, excludes):
+                if not put(item):
+                    return
+        except Exception:
+            # Nothing waits on the walker's future, so log here or not at all
+            logger.exception("Walking %s failed", scan_dir)
+        finally:
+            put(_WALK_DONE)
+
+    with ThreadPoolExecutor(max_workers=len(existing), thread_name_prefix="walk") as executor:
+        for scan_dir in existing:
+            executor.submit(walk, scan_dir)
+        try:
+            remaining = len(existing)
+            while remaining:
+                item = found.get()
+                if item is _WALK_DONE:
+                    remaining -= 1
+                else:
+                    yield item
+        finally:
+            # Release walkers blocked on a full queue if the caller stops early
+            stop.set()
+
+
+# Probers are stateless, so each worker process shares one per category.
+# The VR prober extends the video prober and handles all video files.
+_PROBERS = {"audio": AudioProber(), "video": VRProber()}
+
+
+def _probe_worker(file_path: str, category: str) -> dict | None:
+    """Probe a single file. Runs in a worker process, so it must stay picklable."""
+    return _PROBERS[category].probe(file_path)
+
+
+def _write_audio_metadata(db: Database, file_id: int, result: dict):
+    db.upsert_audio_metadata(file_id, result.get("audio", {}))
+
+
+def _write_video_metadata(db: Database, file_id: int, result: dict):
+    db.upsert_video_metadata(file_id, result)
+    # VR metadata if present
+    if "vr" in result:
+        db.upsert_vr_metadata(file_id, result["vr"])
+
+
+_METADATA_WRITERS = {"audio": _write_audio_metadata, "video": _write_video_metadata}
+
+
+def _store_result(
+    db: Database, file_path: str, category: str, file_size: int, modified_date: str, result: dict
+):
+    """Write one probe result to the database."""
+    media_data = {
+        "file_path": file_path,
+        "filename": os.path.basename(file_path),
+        "file_size": file_size,
+        "modified_date": modified_date,
+        "media_type": result["media_type"],
+        "container_format": result.get("container_format"),
+        "duration": result.get("duration"),
+        "bitrate": result.get("bitrate"),
+    }
+
+    # Savepoint per file, so a failure doesn't leave a half-written row
+    with db.batch():
+        file_id = db.upsert_media_file(media_data)
+        _METADATA_WRITERS[category](db, file_id, result)
+
+
+def _process_pool(max_workers: int) -> ProcessPoolExecutor:
+    """Default probe executor.
+
+    Workers come from a fork server (or are spawned where that's unavailable)
+    rather than forked from this process, whose server, scan and writer
+    threads could leave a forked child deadlocked on a lock they held.
+    """
+    methods = multiprocessing.get_all_start_methods()
+    method = "forkserver" if "forkserver" in methods else "spawn"
+    return ProcessPoolExecutor(max_workers, mp_context=multiprocessing.get_context(method))
+
+
+def _probe_all(
+    executor_factory: Callable[[], Executor],
+    work: Iterable[tuple[str, str, int, str]],
+    window: int,
+) -> Iterator[tuple[tuple[str, str, int, str], Future]]:
+    """Probe work items on executor_factory(), yielding (item, future) as each completes.
+
+    At most window probes are in flight at once, so futures are created as
+    results are consumed instead of one per file up front. If a worker
+    process dies (e.g. a native crash in a demuxer), the pool is replaced and
+    the files that were in flight are re-probed one at a time, so only the
+    file that killed a worker is yielded with a BrokenProcessPool error. The
+    executor is shut down when the generator finishes or is closed; probes
+    still queued at that point are dropped.
+    """
+    work = iter(work)
+    in_flight: dict[Future, tuple[str, str, int, str]] = {}
+    # In flight when a worker died; each is re-probed on its own
+    suspects: list[tuple[str, str, int, str]] = []
+    finished = False
+    executor = executor_factory()
+
+    def submit() -> bool:
+        item = suspects.pop() if suspects else next(work, None)
+        if item is None:
+            return False
+        try:
+            future = executor.submit(_probe_worker, item[0], item[1])
+        except BrokenProcessPool as e:
+            # The pool broke since the last wait; fail the future so it's
+            # handled with the others that were in flight
+            future = Future()
+            future.set_exception(e)
+        in_flight[future] = item
+        return True
+
+    def top_up():
+        while len(in_flight) < (1 if suspects else window) and submit():
+            pass
+
+    try:
+        top_up()
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            if any(isinstance(future.exception(), BrokenProcessPool) for future in done):
+                # Every in-flight future fails once the pool breaks; collect them all
+                done = wait(in_flight).done
+                broken = [f for f in done if isinstance(f.exception(), BrokenProcessPool)]
+                executor.shutdown(wait=False, cancel_futures=True)
+                executor = executor_factory()
+                if len(broken) > 1:
+                    suspects.extend(in_flight.pop(future) for future in broken)
+                    done = [future for future in done if future in in_flight]
+                    top_up()
+            for future in done:
+                item = in_flight.pop(future)
+                # Top the window up before handing the result back, so workers
+                # stay busy while the caller writes to the database
+                top_up()
+                yield item, future
+        finished = True
+    finally:
+        executor.shutdown(wait=finished, cancel_futures=True)
+
+
+class _ResultWriter:
+    """Writes probe results to the database on a dedicated thread.
+
+    The scan loop hands results over through a bounded queue, so reaping
+    finished probes never waits on SQLite. Writes are committed every
+    _WRITE_BATCH_SIZE files or _WRITE_FLUSH_INTERVAL seconds, whichever comes
+    first; each file's writes still roll back on their own if they fail.
+    """
+
+    def __init__(self, db: Database, maxsize: int):
+        self._db = db
+        self._queue: queue.Queue = queue.Queue(maxsize=maxsize)
+        self._error: BaseException | None = None
+        self.files_written = 0
+        self._thread = threading.Thread(target=self._run, name="scan-writer", daemon=True)
+        self._thread.start()
+
+    def put(self, item: tuple[str, str, int, str], result: dict):
+        self._queue.put((item, result))
+
+    def close(self):
+        """Write everything queued so far, then stop the thread.
+
+        Re-raises anything that stopped the writer, e.g. a failed commit.
+        """
+        self._queue.put(None)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+    def _run(self):
+        entry = _WRITER_IDLE
+        try:
+            entry = self._queue.get()
+            while entry is not None:
+                deadline = time.monotonic() + _WRITE_FLUSH_INTERVAL
+                with self._db.batch():
+                    for _ in range(_WRITE_BATCH_SIZE):
+                        self._write(entry)
+                        try:
+                            entry = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                        except queue.Empty:
+                            entry = _WRITER_IDLE
+                            break
+                        if entry is None:
+                            break
+                if entry is _WRITER_IDLE:
+                    # Wait for more results outside a transaction
+                    entry = self._queue.get()
+        except BaseException as e:
+            self._error = e
+            # Keep draining so the scan loop never blocks on a full queue
+            while entry is not None:
+                entry = self._queue.get()
+
+    def _write(self, entry: tuple[tuple[str, str, int, str], dict]):
+        (file_path, category, file_size, modified_date), result = entry
+        try:
+            _store_result(self._db, file_path, category, file_size, modified_date, result)
+            self.files_written += 1
+        except Exception:
+            logger.exception("Error processing %s", file_path)
+
+
+def run_scan(
+    db: Database,
+    config: dict,
+    override_scan_dirs: list[str] | None = None,
+    executor_factory: Callable[[int], Executor] = _process_pool,
+) -> int:
+    """Execute a full scan. Returns the scan_id.
+
+    Files are probed in parallel by executor_factory(max_workers) (a process
+    pool by default, so JSON parsing isn't serialized by the GIL). Change
+    detection runs on the calling thread, and all result writes go through
+    a single writer thread.
+    """
     global scan_progress
 
     if override_scan_dirs is not None:
@@ -89,17 +439,25 @@ def run_scan(db: Database, config: dict, override_scan_dirs: list[str] | None =
         scan_dirs = config.get("scan_dirs") or []
     if isinstance(scan_dirs, str):
         scan_dirs = [scan_dirs]
-    extensions = config.get("file_extensions", {})
+    # Collapse "./", "//" and trailing slashes, so stored paths (and the
+    # fingerprint lookup) don't depend on how a directory was spelled
+    scan_dirs = [str(Path(scan_dir)) for scan_dir in scan_dirs]
+    extensions = media_extensions(config)
+    scan_excludes = config.get("scan_excludes") or []
+    if isinstance(scan_excludes, str):
+        scan_excludes = [scan_excludes]
+    excludes = frozenset(scan_excludes)
 
-    vr_prober = VRProber()
-    audio_prober = AudioProber()
+    # Files are walked lazily as the scan loop consumes them
+    files = _collect_files(scan_dirs, extensions, excludes)
 
-    # Collect files
-    files = _collect_files(scan_dirs, extensions)
+    # One query up front instead of a file_unchanged lookup per file
+    known = db.fetch_file_fingerprints(scan_dirs)
 
     scan_id = db.start_scan()
     scan_progress.running = True
-    scan_progress.total = len(files)
+    # The walk streams files in as probing runs, so total grows as they're found
+    scan_progress.total = 0
     scan_progress.processed = 0
     scan_progress.scan_id = scan_id
 
@@ -107,64 +465,54 @@ def run_scan(db: Database, config: dict, override_scan_dirs: list[str] | None =
     files_updated = 0
     processed = 0
 
-    try:
-        for file_path, category in files:
+    def changed_files() -> Iterator[tuple[str, str, int, str]]:
+        nonlocal processed
+        for item in files:
             if scan_progress.cancel_requested:
-                break
+                return
+            scan_progress.total += 1
+
+            file_path, _, file_size, modified_date = item
+            # Incremental: skip unchanged files
+            if known.get(file_path) != (file_size, modified_date):
+                yield item
+                continue
 
             processed += 1
             scan_progress.update(processed, os.path.basename(file_path))
 
-            try:
-                stat = os.stat(file_path)
-                file_size = stat.st_size
-                modified_date = datetime.fromtimestamp(stat.st_mtime, tz=UTC).isoformat()
-
-                # Incremental: skip unchanged files
-                if db.file_unchanged(file_path, file_size, modified_date):
+    workers = os.cpu_count() or 1
+    try:
+        writer = _ResultWriter(db, maxsize=2 * workers)
+        probes = _probe_all(lambda: executor_factory(workers), changed_files(), 2 * workers)
+        try:
+            for item, future in probes:
+                if scan_progress.cancel_requested:
+                    break
+
+                file_path = item[0]
+                processed += 1
+                scan_progress.update(processed, os.path.basename(file_path))
+
+                try:
+                    result = future.result()
+                except Exception:
+                    logger.exception("Error processing %s", file_path)
                     continue
-
-                # Probe the file
-                if category == "audio":
-                    result = audio_prober.probe(file_path)
-                else:
-                    # Try VR prober first (extends video prober)
-                    result = vr_prober.probe(file_path)
-
                 if result is None:
                     logger.warning("Could not probe: %s", file_path)
                     continue
 
-                # Store in database
-                media_data = {
-                    "file_path": file_path,
-                    "filename": os.path.basename(file_path),
-                    "file_size": file_size,
-                    "modified_date": modified_date,
-                    "media_type": result["media_type"],
-                    "container_format": result.get("container_format"),
-                    "duration": result.get("duration"),
-                    "bitrate": result.get("bitrate"),
-                }
-
-                file_id = db.upsert_media_file(media_data)
-
-                if category == "audio":
-                    db.upsert_audio_metadata(file_id, result.get("audio", {}))
-                else:
-                    # Video metadata
-                    db.upsert_video_metadata(file_id, result)
-                    # VR metadata if present
-                    if "vr" in result:
-                        db.upsert_vr_metadata(file_id, result["vr"])
-
-                files_new += 1  # Simplified: count all processed as new/updated
-
-            except Exception:
-                logger.exception("Error processing %s", file_path)
-                continue
+                writer.put(item, result)
+        finally:
+            # Shuts the pool down; on cancel, queued probes are dropped
+            probes.close()
+            writer.close()
+        files_new = writer.files_written  # Simplified: count all as new/updated
 
         db.finish_scan(scan_id, processed, files_new, files_updated)
+        # The scan may have changed most of the tables; refresh their statistics
+        db.optimize()
     except Exception:
         logger.exception("Scan failed")
         db.fail_scan(scan_id, processed)
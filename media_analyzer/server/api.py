@@ -1,7 +1,6 @@
 """REST API endpoints."""
 
 import os
-import threading
 
 from flask import Blueprint, current_app, jsonify, request
 
@@ -54,7 +53,7 @@ def get_stats():
 
 @api_bp.route("/scan", methods=["POST"])
 def trigger_scan():
-    if scan_progress.running:
+    if scan_progress.busy:
         return jsonify(
             {
                 "error": "Scan already in progress",
@@ -75,8 +74,8 @@ def trigger_scan():
             return jsonify({"error": "Directories not in config", "invalid": invalid}), 400
         override_dirs = requested
 
-    thread = threading.Thread(target=run_scan, args=(db, config, override_dirs), daemon=True)
-    thread.start()
+    executor = current_app.config["SCAN_EXECUTOR"]
+    scan_progress.future = executor.submit(run_scan, db, config, override_dirs)
 
     return jsonify({"status": "started", "message": "Scan started in background"})
 
@@ -112,9 +111,13 @@ def browse_directory():
     return jsonify({"path": path, "directories": entries})
 
 
-@api_bp.route("/config", methods=["GET"])
-def get_config():
-    config = _get_config()
+def cache_config_json(app):
+    """Serialize the client-visible config for GET /api/config.
+
+    Called at startup and after every config update, so GET only ever reads
+    the stored body.
+    """
+    config = app.config["MEDIA_ANALYZER"]
     # Don't expose secrets
     safe_config = {
         "scan_dirs": config.get("scan_dirs", []),
@@ -122,7 +125,13 @@ def get_config():
         "file_extensions": config.get("file_extensions", {}),
         "has_secret_token": bool(config.get("secret_token")),
     }
-    return jsonify(safe_config)
+    app.config["_SAFE_CONFIG_JSON"] = f"{app.json.dumps(safe_config)}\n".encode()
+
+
+@api_bp.route("/config", methods=["GET"])
+def get_config():
+    body = current_app.config["_SAFE_CONFIG_JSON"]
+    return current_app.response_class(body, mimetype="application/json")
 
 
 @api_bp.route("/config", methods=["PUT"])
@@ -152,6 +161,7 @@ def update_config():
 
         save_config(config, Path(config_path))
     current_app.config["MEDIA_ANALYZER"] = config
+    cache_config_json(current_app)
 
     return jsonify({"status": "updated", "warnings": warnings})
 
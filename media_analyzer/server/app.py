@@ -1,10 +1,18 @@
 """Flask app factory."""
 
+from concurrent.futures import ThreadPoolExecutor
+
 from flask import Flask
 
 from media_analyzer.auth import init_auth
 from media_analyzer.db import Database
-from media_analyzer.server.api import api_bp
+from media_analyzer.scanner import scan_progress
+from media_analyzer.server.api import api_bp, cache_config_json
+
+try:
+    from media_analyzer.server.json_provider import OrjsonProvider
+except ImportError:  # orjson is optional; Flask's stdlib json provider is used instead
+    OrjsonProvider = None
 
 
 def create_app(config: dict) -> Flask:
@@ -14,10 +22,16 @@ def create_app(config: dict) -> Flask:
         template_folder="templates",
     )
 
+    if OrjsonProvider is not None:
+        app.json = OrjsonProvider(app)
+
     # Store config and db on app
     app.config["MEDIA_ANALYZER"] = config
     app.config["MEDIA_ANALYZER_CONFIG_PATH"] = config.get("_config_path")
+    cache_config_json(app)
     app.config["DB"] = Database(config["db_path"])
+    # Scans run one at a time on a single long-lived worker thread
+    app.config["SCAN_EXECUTOR"] = ThreadPoolExecutor(max_workers=1, thread_name_prefix="scan")
 
     # Auth middleware
     init_auth(app, config)
@@ -57,3 +71,15 @@ def create_app(config: dict) -> Flask:
         return render_template("settings.html")
 
     return app
+
+
+def shutdown_scans(app: Flask):
+    """Stop any running scan and wait for the scan worker thread to exit.
+
+    Call this once the server has stopped. Interpreter exit joins executor
+    threads before atexit handlers run, so without it a running scan would
+    keep the process alive until it finished.
+    """
+    if scan_progress.busy:
+        scan_progress.cancel_requested = True
+    app.config["SCAN_EXECUTOR"].shutdown(wait=True, cancel_futures=True)
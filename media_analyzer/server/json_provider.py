@@ -0,0 +1,44 @@
+"""Flask JSON provider backed by orjson."""
+
+import orjson
+from flask.json.provider import DefaultJSONProvider
+
+# Leave these types to DefaultJSONProvider.default, so they serialize the same
+# way as with Flask's stdlib provider (e.g. datetimes as HTTP dates)
+_PASSTHROUGH = (
+    orjson.OPT_PASSTHROUGH_DATETIME
+    | orjson.OPT_PASSTHROUGH_DATACLASS
+    | orjson.OPT_PASSTHROUGH_SUBCLASS
+)
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Serialize responses with orjson.
+
+    Output matches DefaultJSONProvider's compact form, except that non-ASCII
+    text is written as UTF-8 instead of \\u escapes. Calls that pass stdlib
+    json options, and pretty-printed debug responses, fall back to the
+    default provider.
+    """
+
+    def dumps(self, obj, **kwargs) -> str:
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return self._dumps_bytes(obj).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self._dumps_bytes(obj) + b"\n", mimetype=self.mimetype)
+
+    def _dumps_bytes(self, obj) -> bytes:
+        option = _PASSTHROUGH | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=self.default, option=option)
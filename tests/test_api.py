@@ -1,9 +1,13 @@
 """Tests for Flask API endpoints."""
 
 import json
+from concurrent.futures import Future
+from datetime import datetime
 
 import pytest
+from flask.json.provider import DefaultJSONProvider
 
+from media_analyzer.scanner import scan_progress
 from media_analyzer.server.app import create_app
 
 
@@ -201,6 +205,24 @@ class TestConfigAPI:
         data = res.get_json()
         assert data["status"] == "updated"
 
+    def test_get_config_after_update(self, client):
+        assert client.get("/api/config").get_json()["scan_dirs"] == []
+        client.put(
+            "/api/config",
+            data=json.dumps({"scan_dirs": ["/tmp/test"]}),
+            content_type="application/json",
+        )
+        assert client.get("/api/config").get_json()["scan_dirs"] == ["/tmp/test"]
+
+    def test_update_rebuilds_config_body(self, app, client):
+        client.put(
+            "/api/config",
+            data=json.dumps({"scan_dirs": ["/tmp/test"]}),
+            content_type="application/json",
+        )
+        # Rebuilt by the PUT itself, not lazily by the next GET
+        assert json.loads(app.config["_SAFE_CONFIG_JSON"])["scan_dirs"] == ["/tmp/test"]
+
 
 class TestScanAPI:
     def test_scan_status(self, client):
@@ -210,6 +232,20 @@ class TestScanAPI:
         assert "running" in data
         assert data["running"] is False
 
+    def test_trigger_scan_runs_on_executor(self, client):
+        res = client.post("/api/scan")
+        assert res.status_code == 200
+
+        scan_progress.future.result(timeout=10)
+        data = client.get("/api/scan/status").get_json()
+        assert data["running"] is False
+        assert data["error"] is None
+
+    def test_trigger_scan_rejected_while_queued(self, client, monkeypatch):
+        monkeypatch.setattr(scan_progress, "future", Future())
+        res = client.post("/api/scan")
+        assert res.status_code == 409
+
 
 class TestAuth:
     def test_no_auth_when_no_token(self, client):
@@ -269,3 +305,25 @@ class TestAuth:
 
         res = client.get("/api/files", headers={"X-API-Key": "wrong-token"})
         assert res.status_code == 401
+
+
+class TestJSONProvider:
+    @pytest.fixture
+    def provider(self, app):
+        pytest.importorskip("orjson")
+        from media_analyzer.server.json_provider import OrjsonProvider
+
+        assert isinstance(app.json, OrjsonProvider)
+        return app.json
+
+    def test_matches_default_provider(self, app, provider):
+        obj = {"b": [1, 2.5, None, True], "a": {"z": "x", "y": datetime(2024, 1, 1)}}
+        default = DefaultJSONProvider(app)
+        assert provider.loads(provider.dumps(obj)) == default.loads(default.dumps(obj))
+        assert provider.dumps(obj) == default.dumps(obj, separators=(",", ":"))
+
+    def test_response(self, app, provider):
+        with app.app_context():
+            res = provider.response({"name": "Café"})
+        assert res.mimetype == "application/json"
+        assert res.get_data() == '{"name":"Café"}\n'.encode()
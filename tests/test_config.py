@@ -0,0 +1,78 @@
+"""Tests for config loading and saving."""
+
+from media_analyzer.config import (
+    DEFAULT_CONFIG,
+    _deep_merge,
+    load_config,
+    media_extensions,
+    save_config,
+)
+
+
+class TestDeepMerge:
+    def test_nested_override(self):
+        base = {"a": {"b": 1, "c": {"d": 2}}, "e": 3}
+        merged = _deep_merge(base, {"a": {"c": {"d": 5}}, "f": 6})
+        assert merged == {"a": {"b": 1, "c": {"d": 5}}, "e": 3, "f": 6}
+
+    def test_base_not_mutated(self):
+        base = {"a": {"b": [1]}}
+        merged = _deep_merge(base, {})
+        merged["a"]["b"].append(2)
+        assert base == {"a": {"b": [1]}}
+
+    def test_non_dict_replaces_dict(self):
+        assert _deep_merge({"a": {"b": 1}}, {"a": None}) == {"a": None}
+
+
+class TestLoadConfig:
+    def test_defaults_without_file(self, tmp_path):
+        config = load_config(tmp_path / "config.yaml")
+        assert config["server"]["port"] == 8080
+        assert config["scan_dirs"] == []
+
+    def test_mutation_does_not_touch_defaults(self, tmp_path):
+        config = load_config(tmp_path / "config.yaml")
+        config["server"]["host"] = "127.0.0.1"
+        config["file_extensions"]["video"].append(".webm")
+        assert DEFAULT_CONFIG["server"]["host"] == "0.0.0.0"
+        assert ".webm" not in DEFAULT_CONFIG["file_extensions"]["video"]
+
+    def test_user_values_override_defaults(self, tmp_path):
+        path = tmp_path / "config.yaml"
+        path.write_text("scan_dirs: /media\nserver:\n  port: 9000\n")
+
+        config = load_config(path)
+        assert config["scan_dirs"] == ["/media"]
+        assert config["server"]["port"] == 9000
+        assert config["server"]["host"] == "0.0.0.0"
+
+    def test_bare_string_scan_excludes(self, tmp_path):
+        path = tmp_path / "config.yaml"
+        path.write_text("scan_excludes: node_modules\n")
+
+        assert load_config(path)["scan_excludes"] == ["node_modules"]
+
+    def test_repeated_loads_are_independent(self, tmp_path):
+        path = tmp_path / "config.yaml"
+        path.write_text("server:\n  port: 9000\n")
+
+        first = load_config(path)
+        first["server"]["port"] = 1234
+        assert load_config(path)["server"]["port"] == 9000
+
+    def test_reload_after_save(self, tmp_path):
+        path = tmp_path / "config.yaml"
+        config = load_config(path)
+        config["scan_dirs"] = ["/media/movies"]
+        save_config(config, path)
+
+        assert load_config(path)["scan_dirs"] == ["/media/movies"]
+
+
+class TestMediaExtensions:
+    def test_lowercased_frozensets(self):
+        config = {"file_extensions": {"video": [".MP4", ".mkv"], "audio": None}}
+        exts = media_extensions(config)
+        assert exts == {"video": frozenset({".mp4", ".mkv"}), "audio": frozenset()}
+        assert isinstance(exts["video"], frozenset)
@@ -0,0 +1,191 @@
+"""Tests for the SQLite database layer."""
+
+import threading
+
+import pytest
+
+from media_analyzer.db import Database
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = Database(str(tmp_path / "test.db"))
+    yield database
+    database.close()
+
+
+def _media(path: str, media_type: str = "video", **extra) -> dict:
+    return {
+        "file_path": path,
+        "filename": path.rsplit("/", 1)[-1],
+        "file_size": 1000,
+        "modified_date": "2024-01-01T00:00:00+00:00",
+        "media_type": media_type,
+        **extra,
+    }
+
+
+class TestConnections:
+    def test_finished_thread_connection_closed(self, db):
+        threads = [threading.Thread(target=db.list_files) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+            thread.join()
+
+        # Opening the second thread's connection closed the first one's
+        assert set(db._connections) == {threading.current_thread(), threads[1]}
+
+
+class TestBatch:
+    def test_commits_on_exit(self, db, tmp_path):
+        with db.batch():
+            file_id = db.upsert_media_file(_media("/test/video.mp4"))
+            db.upsert_video_metadata(file_id, {"width": 1920, "height": 1080})
+
+        # Visible from a fresh connection once the batch has committed
+        other = Database(db.db_path)
+        assert other.get_file_detail(file_id)["width"] == 1920
+        other.close()
+
+    def test_rolls_back_on_error(self, db):
+        with pytest.raises(RuntimeError), db.batch():
+            db.upsert_media_file(_media("/test/video.mp4"))
+            raise RuntimeError("boom")
+
+        assert db.list_files()["total"] == 0
+
+    def test_nested_batch_joins_outer(self, db):
+        with pytest.raises(RuntimeError), db.batch():
+            with db.batch():
+                db.upsert_media_file(_media("/test/video.mp4"))
+            raise RuntimeError("boom")
+
+        assert db.list_files()["total"] == 0
+
+    def test_failed_nested_batch_keeps_outer(self, db):
+        with db.batch():
+            db.upsert_media_file(_media("/test/kept.mp4"))
+            with pytest.raises(RuntimeError), db.batch():
+                db.upsert_media_file(_media("/test/dropped.mp4"))
+                raise RuntimeError("boom")
+
+        files = db.list_files()["files"]
+        assert [f["file_path"] for f in files] == ["/test/kept.mp4"]
+
+
+class TestOptimize:
+    def test_collects_stats_once_tables_have_rows(self, db):
+        def has_stats():
+            return db._conn().execute("SELECT 1 FROM sqlite_stat1 LIMIT 1").fetchone()
+
+        # Analyzing the empty tables of a new database records nothing
+        assert not has_stats()
+
+        for i in range(3):
+            db.upsert_media_file(_media(f"/test/video{i}.mp4"))
+        db.optimize()
+        assert has_stats()
+
+
+class TestUpsertMediaFile:
+    @pytest.mark.parametrize("has_returning", [True, False])
+    def test_update_returns_existing_id(self, db, monkeypatch, has_returning):
+        monkeypatch.setattr("media_analyzer.db._HAS_RETURNING", has_returning)
+        first_id = db.upsert_media_file(_media("/test/a.mp4"))
+        second_id = db.upsert_media_file(_media("/test/b.mp4"))
+
+        assert db.upsert_media_file(_media("/test/a.mp4", file_size=2000)) == first_id
+        assert db.upsert_media_file(_media("/test/b.mp4", file_size=2000)) == second_id
+        assert db.get_file_detail(first_id)["file_size"] == 2000
+
+
+class TestFetchFileFingerprints:
+    def test_all_files(self, db):
+        db.upsert_media_file(_media("/test/a.mp4"))
+        db.upsert_media_file(_media("/other/b.mp4", file_size=5))
+
+        assert db.fetch_file_fingerprints() == {
+            "/test/a.mp4": (1000, "2024-01-01T00:00:00+00:00"),
+            "/other/b.mp4": (5, "2024-01-01T00:00:00+00:00"),
+        }
+
+    def test_limited_to_scan_dirs(self, db):
+        db.upsert_media_file(_media("/data/movies/a.mp4"))
+        db.upsert_media_file(_media("/data/movies/sub/b.mp4"))
+        db.upsert_media_file(_media("/data/movies2/c.mp4"))
+        db.upsert_media_file(_media("/data/music/d.mp3", media_type="audio"))
+
+        fingerprints = db.fetch_file_fingerprints(["/data/movies/", "/data/music"])
+        assert set(fingerprints) == {
+            "/data/movies/a.mp4",
+            "/data/movies/sub/b.mp4",
+            "/data/music/d.mp3",
+        }
+
+
+class TestListFiles:
+    def test_total_counts_all_matches(self, db):
+        for i in range(5):
+            db.upsert_media_file(_media(f"/test/video{i}.mp4"))
+        db.upsert_media_file(_media("/test/song.mp3", media_type="audio"))
+
+        result = db.list_files(media_type="video", per_page=2)
+        assert result["total"] == 5
+        assert result["pages"] == 3
+        assert len(result["files"]) == 2
+        assert "_total" not in result["files"][0]
+
+    def test_total_past_last_page(self, db):
+        for i in range(3):
+            db.upsert_media_file(_media(f"/test/video{i}.mp4"))
+
+        result = db.list_files(page=5, per_page=2)
+        assert result["files"] == []
+        assert result["total"] == 3
+
+    def test_total_with_zero_page_size(self, db):
+        for i in range(3):
+            db.upsert_media_file(_media(f"/test/video{i}.mp4"))
+
+        result = db.list_files(per_page=0)
+        assert result["files"] == []
+        assert result["total"] == 3
+
+    def test_cached_total_survives_page_size_change(self, db):
+        for i in range(3):
+            db.upsert_media_file(_media(f"/test/video{i}.mp4"))
+
+        assert db.list_files(per_page=0)["total"] == 3
+        result = db.list_files(per_page=50)
+        assert result["total"] == 3
+        assert result["pages"] == 1
+
+    def test_cached_total_refreshed_after_write(self, db):
+        db.upsert_media_file(_media("/test/video0.mp4"))
+        assert db.list_files(per_page=1)["total"] == 1
+        # Second page reuses the cached count
+        assert db.list_files(page=2, per_page=1)["total"] == 1
+
+        db.upsert_media_file(_media("/test/video1.mp4"))
+        result = db.list_files(page=2, per_page=1)
+        assert result["total"] == 2
+        assert len(result["files"]) == 1
+
+
+class TestFileDetail:
+    def test_audio_fields_not_shadowed_by_video_columns(self, db):
+        file_id = db.upsert_media_file(_media("/test/song.flac", media_type="audio"))
+        db.upsert_audio_metadata(file_id, {"audio_bitrate": 900000, "title": "Song"})
+
+        detail = db.get_file_detail(file_id)
+        assert detail["id"] == file_id
+        assert detail["audio_bitrate"] == 900000
+        assert detail["title"] == "Song"
+
+    def test_video_audio_bitrate(self, db):
+        file_id = db.upsert_media_file(_media("/test/video.mp4"))
+        db.upsert_video_metadata(file_id, {"width": 1920, "audio_bitrate": 128000})
+
+        detail = db.get_file_detail(file_id)
+        assert detail["width"] == 1920
+        assert detail["audio_bitrate"] == 128000
@@ -1,13 +1,45 @@
 """Tests for media probers."""
 
-from unittest.mock import patch
+import subprocess
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
 
 import pytest
 
 from media_analyzer.probers.audio import AudioProber
+from media_analyzer.probers.base import FFPROBE_TIMEOUT
 from media_analyzer.probers.video import VideoProber, _parse_frame_rate, _resolution_label
 from media_analyzer.probers.vr import VRProber, _detect_format_from_ratio, _detect_vr_from_filename
 
+# --- ffprobe runner ---
+
+
+class TestRunFFprobe:
+    @pytest.fixture(autouse=True, params=["orjson", "json"])
+    def json_loads(self, request, monkeypatch):
+        module = pytest.importorskip(request.param)
+        monkeypatch.setattr("media_analyzer.probers.base._json_loads", module.loads)
+
+    @patch("media_analyzer.probers.base.subprocess.run")
+    def test_parses_bytes_output(self, mock_run):
+        mock_run.return_value = subprocess.CompletedProcess(
+            [], 0, stdout='{"format": {"tags": {"title": "Caf\u00e9"}}}'.encode()
+        )
+        data = AudioProber()._run_ffprobe(["-show_format"], "/test/song.mp3")
+        assert data == {"format": {"tags": {"title": "Caf\u00e9"}}}
+        assert "text" not in mock_run.call_args.kwargs
+
+    @patch("media_analyzer.probers.base.subprocess.run")
+    def test_invalid_output(self, mock_run):
+        mock_run.return_value = subprocess.CompletedProcess([], 0, stdout=b"\xff not json")
+        assert AudioProber()._run_ffprobe(["-show_format"], "/test/song.mp3") is None
+
+    @patch("media_analyzer.probers.base.subprocess.run")
+    def test_timeout(self, mock_run):
+        mock_run.side_effect = subprocess.TimeoutExpired("ffprobe", 60)
+        assert AudioProber()._run_ffprobe(["-show_format"], "/test/song.mp3") is None
+
+
 # --- Video Prober ---
 
 
@@ -49,10 +81,11 @@ class TestParseFrameRate:
 
 
 def _mock_ffprobe_video():
-    """Return mock ffprobe outputs for a standard video file."""
-    video_stream = {
+    """Return mock combined ffprobe output for a standard video file."""
+    return {
         "streams": [
             {
+                "codec_type": "video",
                 "width": 1920,
                 "height": 1080,
                 "r_frame_rate": "30/1",
@@ -60,29 +93,26 @@ def _mock_ffprobe_video():
                 "pix_fmt": "yuv420p",
                 "color_space": "bt709",
                 "bit_rate": "5000000",
-            }
-        ]
-    }
-    audio_stream = {"streams": [{"codec_name": "aac", "bit_rate": "128000"}]}
-    format_info = {
+            },
+            {"codec_type": "audio", "codec_name": "aac", "bit_rate": "128000"},
+        ],
         "format": {
             "duration": "120.5",
             "bit_rate": "5128000",
             "format_name": "mov,mp4,m4a,3gp,3g2,mj2",
-        }
+        },
     }
-    return video_stream, audio_stream, format_info
 
 
 class TestVideoProber:
     @patch.object(VideoProber, "_run_ffprobe")
     def test_probe_success(self, mock_ffprobe):
-        video, audio, fmt = _mock_ffprobe_video()
-        mock_ffprobe.side_effect = [video, audio, fmt]
+        mock_ffprobe.return_value = _mock_ffprobe_video()
 
         prober = VideoProber()
         result = prober.probe("/test/video.mp4")
 
+        mock_ffprobe.assert_called_once()
         assert result is not None
         assert result["width"] == 1920
         assert result["height"] == 1080
@@ -93,6 +123,18 @@ class TestVideoProber:
         assert result["duration"] == 120.5
         assert result["bitrate_per_pixel"] is not None
 
+    @patch.object(VideoProber, "_run_ffprobe")
+    def test_probe_without_audio(self, mock_ffprobe):
+        data = _mock_ffprobe_video()
+        data["streams"] = data["streams"][:1]
+        mock_ffprobe.return_value = data
+
+        result = VideoProber().probe("/test/video.mp4")
+
+        assert result is not None
+        assert result["audio_codec"] is None
+        assert result["video_bitrate"] == 5000000
+
     @patch.object(VideoProber, "_run_ffprobe")
     def test_probe_no_streams(self, mock_ffprobe):
         mock_ffprobe.return_value = {"streams": []}
@@ -106,6 +148,87 @@ class TestVideoProber:
         assert prober.probe("/test/video.mp4") is None
 
 
+class TestVideoProberPyAV:
+    @pytest.fixture
+    def video_file(self, tmp_path):
+        av = pytest.importorskip("av")
+        path = tmp_path / "clip.mp4"
+        with av.open(str(path), "w") as container:
+            stream = container.add_stream("mpeg4", rate=30)
+            stream.width = 320
+            stream.height = 240
+            stream.pix_fmt = "yuv420p"
+            for i in range(10):
+                frame = av.VideoFrame(320, 240, "yuv420p")
+                frame.pts = i
+                for packet in stream.encode(frame):
+                    container.mux(packet)
+            for packet in stream.encode():
+                container.mux(packet)
+        return str(path)
+
+    @patch.object(VideoProber, "_run_ffprobe")
+    def test_probe_in_process(self, mock_ffprobe, video_file):
+        result = VideoProber().probe(video_file)
+
+        mock_ffprobe.assert_not_called()
+        assert result["width"] == 320
+        assert result["height"] == 240
+        assert result["video_codec"] == "mpeg4"
+        assert result["frame_rate"] == 30.0
+        assert result["pixel_format"] == "yuv420p"
+        assert result["audio_codec"] is None
+
+    @patch.object(VideoProber, "_run_ffprobe")
+    def test_stream_without_decoder_uses_ffprobe(self, mock_ffprobe):
+        av = pytest.importorskip("av")
+        mock_ffprobe.return_value = _mock_ffprobe_video()
+        container = MagicMock()
+        container.__enter__.return_value = container
+        container.streams = [SimpleNamespace(type="video", codec_context=None, metadata={})]
+
+        with patch.object(av, "open", return_value=container):
+            result = VideoProber().probe("/test/video.mkv")
+
+        mock_ffprobe.assert_called_once()
+        assert result["width"] == 1920
+
+    @patch.object(VideoProber, "_run_ffprobe")
+    def test_open_is_time_limited(self, mock_ffprobe, video_file):
+        av = pytest.importorskip("av")
+        with patch.object(av, "open", wraps=av.open) as mock_open:
+            assert VideoProber().probe(video_file) is not None
+
+        assert mock_open.call_args.kwargs["timeout"] == FFPROBE_TIMEOUT
+
+    @patch.object(VideoProber, "_run_ffprobe")
+    def test_reports_codec_not_decoder_name(self, mock_ffprobe, tmp_path):
+        av = pytest.importorskip("av")
+        np = pytest.importorskip("numpy")
+        path = str(tmp_path / "clip.mkv")
+        with av.open(path, "w") as container:
+            video = container.add_stream("mpeg4", rate=30)
+            video.width, video.height, video.pix_fmt = 320, 240, "yuv420p"
+            audio = container.add_stream("mp3", rate=44100)
+            audio.layout = "stereo"
+            frame = av.VideoFrame(320, 240, "yuv420p")
+            for packet in video.encode(frame):
+                container.mux(packet)
+            samples = av.AudioFrame.from_ndarray(
+                np.zeros((2, 1152), dtype=np.float32), format="fltp", layout="stereo"
+            )
+            samples.sample_rate = 44100
+            for stream, item in ((video, None), (audio, samples), (audio, None)):
+                for packet in stream.encode(item):
+                    container.mux(packet)
+
+        result = VideoProber().probe(path)
+
+        mock_ffprobe.assert_not_called()
+        # PyAV opens MP3 with the "mp3float" decoder; ffprobe calls the codec "mp3"
+        assert result["audio_codec"] == "mp3"
+
+
 # --- VR Detection ---
 
 
@@ -138,6 +261,14 @@ class TestVRFilenameDetection:
         indicators = _detect_vr_from_filename("video_3dh_4k.mp4")
         assert indicators.get("half_sbs") is True
 
+    def test_180x180(self):
+        indicators = _detect_vr_from_filename("video180x180.mp4")
+        assert indicators == {"180": True}
+
+    def test_adjacent_tokens_share_separator(self):
+        indicators = _detect_vr_from_filename("video_180_sbs_3dh.mp4")
+        assert indicators == {"180": True, "sbs": True, "half_sbs": True}
+
     def test_no_match(self):
         indicators = _detect_vr_from_filename("regular_video.mp4")
         assert len(indicators) == 0
@@ -159,31 +290,43 @@ class TestFormatFromRatio:
 
 
 class TestVRProber:
-    @patch.object(VRProber, "_run_ffprobe_raw")
     @patch.object(VRProber, "_run_ffprobe")
-    def test_vr_by_filename(self, mock_ffprobe, mock_raw):
-        video, audio, fmt = _mock_ffprobe_video()
+    def test_vr_by_filename(self, mock_ffprobe):
+        data = _mock_ffprobe_video()
         # Override to 2:1 ratio for SBS
-        video["streams"][0]["width"] = 3840
-        video["streams"][0]["height"] = 1920
-        mock_ffprobe.side_effect = [video, audio, fmt]
-        mock_raw.return_value = ""
+        data["streams"][0]["width"] = 3840
+        data["streams"][0]["height"] = 1920
+        mock_ffprobe.return_value = data
 
         prober = VRProber()
         result = prober.probe("/test/video_180_sbs.mp4")
 
+        mock_ffprobe.assert_called_once()
         assert result is not None
         assert result["media_type"] == "vr"
         assert result["vr"]["is_vr"] is True
         assert result["vr"]["vr_format"] == "SBS"
         assert result["vr"]["per_eye_width"] == 1920
 
-    @patch.object(VRProber, "_run_ffprobe_raw")
     @patch.object(VRProber, "_run_ffprobe")
-    def test_non_vr(self, mock_ffprobe, mock_raw):
-        video, audio, fmt = _mock_ffprobe_video()
-        mock_ffprobe.side_effect = [video, audio, fmt]
-        mock_raw.return_value = ""
+    def test_vr_by_embedded_tags(self, mock_ffprobe):
+        data = _mock_ffprobe_video()
+        data["streams"][0]["tags"] = {"stereo_mode": "top_bottom"}
+        data["format"]["tags"] = {"Spherical": "true", "ProjectionType": "equirectangular"}
+        mock_ffprobe.return_value = data
+
+        result = VRProber().probe("/test/regular_video.mp4")
+
+        assert result["media_type"] == "vr"
+        assert result["vr"]["stereo_mode"] == "top_bottom"
+        assert result["vr"]["spherical"] is True
+        assert result["vr"]["projection_type"] == "equirectangular"
+        assert result["vr"]["vr_format"] == "TB"
+        assert result["vr"]["fov"] == "360"
+
+    @patch.object(VRProber, "_run_ffprobe")
+    def test_non_vr(self, mock_ffprobe):
+        mock_ffprobe.return_value = _mock_ffprobe_video()
 
         prober = VRProber()
         result = prober.probe("/test/regular_video.mp4")
@@ -199,37 +342,31 @@ class TestVRProber:
 class TestAudioProber:
     @patch.object(AudioProber, "_run_ffprobe")
     def test_probe_mp3(self, mock_ffprobe):
-        audio_stream = {
+        mock_ffprobe.return_value = {
             "streams": [
                 {
+                    "codec_type": "audio",
                     "codec_name": "mp3",
                     "sample_rate": "44100",
                     "bits_per_raw_sample": "16",
                     "channels": "2",
                     "bit_rate": "320000",
                 }
-            ]
-        }
-        fmt = {
+            ],
             "format": {
                 "duration": "240.0",
                 "bit_rate": "320000",
                 "format_name": "mp3",
-            }
-        }
-        tags = {
-            "format": {
                 "tags": {
-                    "title": "Test Song",
+                    "TITLE": "Test Song",
                     "artist": "Test Artist",
                     "album": "Test Album",
                     "genre": "Rock",
                     "date": "2024",
                     "track": "1",
-                }
-            }
+                },
+            },
         }
-        mock_ffprobe.side_effect = [audio_stream, fmt, tags]
 
         prober = AudioProber()
         result = prober.probe("/test/song.mp3")
@@ -241,29 +378,27 @@ class TestAudioProber:
         assert result["audio"]["is_lossless"] is False
         assert result["audio"]["title"] == "Test Song"
         assert result["audio"]["artist"] == "Test Artist"
+        mock_ffprobe.assert_called_once()
 
     @patch.object(AudioProber, "_run_ffprobe")
     def test_probe_flac_lossless(self, mock_ffprobe):
-        audio_stream = {
+        mock_ffprobe.return_value = {
             "streams": [
                 {
+                    "codec_type": "audio",
                     "codec_name": "flac",
                     "sample_rate": "96000",
                     "bits_per_raw_sample": "24",
                     "channels": "2",
                     "bit_rate": None,
                 }
-            ]
-        }
-        fmt = {
+            ],
             "format": {
                 "duration": "300.0",
                 "bit_rate": "1500000",
                 "format_name": "flac",
-            }
+            },
         }
-        tags = {"format": {"tags": {}}}
-        mock_ffprobe.side_effect = [audio_stream, fmt, tags]
 
         prober = AudioProber()
         result = prober.probe("/test/song.flac")
@@ -272,6 +407,7 @@ class TestAudioProber:
         assert result["audio"]["is_lossless"] is True
         assert result["audio"]["bit_depth"] == 24
         assert result["audio"]["sample_rate"] == 96000
+        assert result["audio"]["audio_bitrate"] == 1500000
 
     @patch.object(AudioProber, "_run_ffprobe")
     def test_probe_failure(self, mock_ffprobe):
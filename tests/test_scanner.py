@@ -0,0 +1,336 @@
+"""Tests for the directory scanner."""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from media_analyzer.db import Database
+from media_analyzer.scanner import (
+    _collect_files,
+    _probe_all,
+    _process_pool,
+    _ResultWriter,
+    _walk_scan_dir,
+    run_scan,
+    scan_progress,
+)
+
+EXTENSIONS = {
+    "video": frozenset({".mp4", ".mkv"}),
+    "audio": frozenset({".mp3", ".flac"}),
+}
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = Database(str(tmp_path / "test.db"))
+    yield database
+    database.close()
+
+
+def _fake_probe(file_path, category):
+    if file_path.endswith("broken.mp4"):
+        return None
+    if category == "audio":
+        return {"media_type": "audio", "audio": {"sample_rate": 44100}}
+    return {"media_type": "video", "width": 1920, "height": 1080}
+
+
+def _crashing_probe(file_path, category):
+    """Stand-in probe that kills its worker process, like a native crash."""
+    if file_path.endswith("crash.mp4"):
+        os._exit(1)
+    return _fake_probe(file_path, category)
+
+
+def _collect(scan_dirs):
+    """Run _collect_files and keep just (file_path, category)."""
+    return [(path, category) for path, category, _, _ in _collect_files(scan_dirs, EXTENSIONS)]
+
+
+def _touch(path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"")
+    return str(path)
+
+
+class TestCollectFiles:
+    def test_recurses_and_categorizes(self, tmp_path):
+        video = _touch(tmp_path / "movies" / "a" / "film.MKV")
+        audio = _touch(tmp_path / "music" / "song.flac")
+        _touch(tmp_path / "music" / "cover.jpg")
+
+        files = _collect([str(tmp_path)])
+        assert sorted(files) == sorted([(video, "video"), (audio, "audio")])
+
+    def test_extension_in_both_categories_is_video(self, tmp_path):
+        path = _touch(tmp_path / "clip.m4a")
+        extensions = {"video": frozenset({".m4a"}), "audio": frozenset({".m4a"})}
+
+        files = _collect_files([str(tmp_path)], extensions)
+        assert [(p, category) for p, category, _, _ in files] == [(path, "video")]
+
+    def test_files_in_inode_order(self, tmp_path):
+        paths = [_touch(tmp_path / f"{name}.mp4") for name in ("c", "a", "d", "b")]
+        expected = sorted(paths, key=lambda path: os.stat(path).st_ino)
+
+        assert [path for path, _ in _collect([str(tmp_path)])] == expected
+
+    def test_reports_size_and_mtime(self, tmp_path):
+        path = tmp_path / "film.mp4"
+        path.write_bytes(b"x" * 10)
+        os.utime(path, (0, 1704067200.5))
+
+        assert list(_collect_files([str(tmp_path)], EXTENSIONS)) == [
+            (str(path), "video", 10, "2024-01-01T00:00:00.500000+00:00")
+        ]
+
+    def test_hidden_and_excluded_dirs_skipped(self, tmp_path):
+        video = _touch(tmp_path / "movies" / "a.mp4")
+        _touch(tmp_path / ".Trash" / "b.mp4")
+        _touch(tmp_path / "movies" / "@eaDir" / "c.mp4")
+
+        files = _collect_files([str(tmp_path)], EXTENSIONS, frozenset({"@eaDir"}))
+        assert [path for path, _, _, _ in files] == [video]
+
+    def test_symlink_loop_skipped(self, tmp_path):
+        os.symlink("self.mp4", tmp_path / "self.mp4")
+        video = _touch(tmp_path / "a.mp4")
+
+        assert _collect([str(tmp_path)]) == [(video, "video")]
+
+    def test_failed_walker_logged(self, tmp_path, monkeypatch, caplog):
+        def fail(scan_dir, *args):
+            if scan_dir.endswith("one"):
+                raise RuntimeError("boom")
+            yield from walk(scan_dir, *args)
+
+        walk = _walk_scan_dir
+        monkeypatch.setattr("media_analyzer.scanner._walk_scan_dir", fail)
+        _touch(tmp_path / "one" / "a.mp4")
+        video = _touch(tmp_path / "two" / "b.mp4")
+
+        assert _collect([str(tmp_path / "one"), str(tmp_path / "two")]) == [(video, "video")]
+        assert "Walking" in caplog.text and "boom" in caplog.text
+
+    def test_files_without_extension_skipped(self, tmp_path):
+        _touch(tmp_path / ".mp4")
+        _touch(tmp_path / "mp4")
+        video = _touch(tmp_path / "a.b.mp4")
+
+        assert _collect([str(tmp_path)]) == [(video, "video")]
+
+    def test_multiple_dirs(self, tmp_path):
+        dirs = [tmp_path / name for name in ("one", "two", "three")]
+        expected = [(_touch(d / f"{i}.mp4"), "video") for d in dirs for i in range(20)]
+
+        files = _collect([str(d) for d in dirs])
+        assert sorted(files) == sorted(expected)
+
+    def test_multiple_dirs_stopped_early(self, tmp_path, monkeypatch):
+        monkeypatch.setattr("media_analyzer.scanner._WALK_QUEUE_SIZE", 1)
+        dirs = [tmp_path / "one", tmp_path / "two"]
+        for d in dirs:
+            for i in range(10):
+                _touch(d / f"{i}.mp4")
+
+        files = _collect_files([str(d) for d in dirs], EXTENSIONS)
+        next(files)
+        # Closing must not hang on walkers blocked by the full queue
+        files.close()
+
+    def test_missing_dir_skipped(self, tmp_path):
+        video = _touch(tmp_path / "a.mp4")
+
+        files = _collect([str(tmp_path / "missing"), str(tmp_path)])
+        assert files == [(video, "video")]
+
+    def test_symlinked_dir_not_followed(self, tmp_path):
+        _touch(tmp_path / "outside" / "a.mp4")
+        (tmp_path / "lib").mkdir()
+        os.symlink(tmp_path / "outside", tmp_path / "lib" / "link")
+
+        assert _collect([str(tmp_path / "lib")]) == []
+
+    def test_symlink_escape_skipped(self, tmp_path):
+        outside = _touch(tmp_path / "outside" / "a.mp4")
+        (tmp_path / "lib").mkdir()
+        os.symlink(outside, tmp_path / "lib" / "a.mp4")
+
+        assert _collect([str(tmp_path / "lib")]) == []
+
+    def test_symlink_to_sibling_with_shared_prefix_skipped(self, tmp_path):
+        outside = _touch(tmp_path / "lib2" / "a.mp4")
+        (tmp_path / "lib").mkdir()
+        os.symlink(outside, tmp_path / "lib" / "a.mp4")
+
+        assert _collect([str(tmp_path / "lib")]) == []
+
+    def test_symlink_within_dir_kept(self, tmp_path):
+        target = _touch(tmp_path / "lib" / "sub" / "a.mp4")
+        link = tmp_path / "lib" / "b.mp4"
+        os.symlink(target, link)
+
+        files = _collect([str(tmp_path / "lib")])
+        assert sorted(files) == sorted([(target, "video"), (str(link), "video")])
+
+
+class TestProbeAll:
+    def test_limits_in_flight_probes(self, monkeypatch):
+        monkeypatch.setattr("media_analyzer.scanner._probe_worker", lambda path, category: path)
+        submitted = []
+
+        class RecordingExecutor(ThreadPoolExecutor):
+            def submit(self, fn, *args):
+                submitted.append(args[0])
+                return super().submit(fn, *args)
+
+        work = [(f"/test/{i}.mp4", "video", 0, "") for i in range(10)]
+        results = []
+        for n, (item, future) in enumerate(_probe_all(lambda: RecordingExecutor(2), work, 3), 1):
+            assert len(submitted) <= n + 3
+            assert future.result() == item[0]
+            results.append(item)
+
+        assert sorted(results) == sorted(work)
+
+    def test_worker_crash_fails_only_that_file(self, monkeypatch):
+        monkeypatch.setattr("media_analyzer.scanner._probe_worker", _crashing_probe)
+        work = [(f"/test/{i}.mp4", "video", 0, "") for i in range(6)]
+        work.insert(3, ("/test/crash.mp4", "video", 0, ""))
+
+        failed = []
+        for item, future in _probe_all(lambda: _process_pool(2), work, 4):
+            if future.exception() is not None:
+                assert isinstance(future.exception(), BrokenProcessPool)
+                failed.append(item[0])
+            else:
+                assert future.result() is not None
+        assert failed == ["/test/crash.mp4"]
+
+
+class TestResultWriter:
+    def test_commits_after_flush_interval(self, db, monkeypatch):
+        monkeypatch.setattr("media_analyzer.scanner._WRITE_FLUSH_INTERVAL", 0.01)
+        writer = _ResultWriter(db, maxsize=4)
+        writer.put(
+            ("/test/a.mp4", "video", 1, "2024-01-01T00:00:00+00:00"), {"media_type": "video"}
+        )
+
+        # Committed without waiting for a full batch or close()
+        deadline = time.monotonic() + 5
+        while not db.fetch_file_fingerprints() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert list(db.fetch_file_fingerprints()) == ["/test/a.mp4"]
+
+        writer.close()
+        assert writer.files_written == 1
+
+    def test_close_raises_writer_error(self, db, monkeypatch):
+        def fail(*args):
+            raise RuntimeError("disk full")
+
+        monkeypatch.setattr(db, "batch", fail)
+        writer = _ResultWriter(db, maxsize=1)
+        for i in range(3):
+            writer.put((f"/test/{i}.mp4", "video", 1, ""), {"media_type": "video"})
+
+        with pytest.raises(RuntimeError, match="disk full"):
+            writer.close()
+
+
+class TestRunScan:
+    @pytest.fixture(autouse=True)
+    def fake_probe(self, monkeypatch):
+        calls = []
+
+        def probe(file_path, category):
+            calls.append(file_path)
+            return _fake_probe(file_path, category)
+
+        monkeypatch.setattr("media_analyzer.scanner._probe_worker", probe)
+        return calls
+
+    def _scan(self, db, scan_dir, **config):
+        config = {
+            "scan_dirs": [str(scan_dir)],
+            "file_extensions": {"video": [".mp4"], "audio": [".mp3"]},
+            **config,
+        }
+        return run_scan(db, config, executor_factory=lambda workers: ThreadPoolExecutor(2))
+
+    def test_stores_probe_results(self, db, tmp_path):
+        _touch(tmp_path / "film.mp4")
+        _touch(tmp_path / "song.mp3")
+        _touch(tmp_path / "broken.mp4")
+
+        self._scan(db, tmp_path)
+
+        files = {f["filename"]: f for f in db.list_files(sort="filename")["files"]}
+        assert set(files) == {"film.mp4", "song.mp3"}
+        assert files["film.mp4"]["height"] == 1080
+        assert db.get_file_detail(files["song.mp3"]["id"])["sample_rate"] == 44100
+
+    def test_unchanged_files_not_reprobed(self, db, tmp_path, fake_probe):
+        _touch(tmp_path / "film.mp4")
+
+        self._scan(db, tmp_path)
+        self._scan(db, tmp_path)
+        assert len(fake_probe) == 1
+
+    def test_scan_dir_spelling_normalized(self, db, tmp_path, fake_probe):
+        _touch(tmp_path / "lib" / "film.mp4")
+
+        self._scan(db, f"{tmp_path}//lib/")
+        self._scan(db, tmp_path / "lib")
+        assert list(db.fetch_file_fingerprints()) == [str(tmp_path / "lib" / "film.mp4")]
+        assert len(fake_probe) == 1
+
+    def test_bare_string_exclude(self, db, tmp_path):
+        _touch(tmp_path / "node_modules" / "a.mp4")
+        video = _touch(tmp_path / "o" / "b.mp4")
+
+        self._scan(db, tmp_path, scan_excludes="node_modules")
+        assert list(db.fetch_file_fingerprints()) == [video]
+
+    def test_writes_span_several_batches(self, db, tmp_path, monkeypatch):
+        monkeypatch.setattr("media_analyzer.scanner._WRITE_BATCH_SIZE", 2)
+        for i in range(5):
+            _touch(tmp_path / f"film{i}.mp4")
+
+        self._scan(db, tmp_path)
+        assert db.list_files()["total"] == 5
+
+    def test_worker_crash_does_not_fail_scan(self, db, tmp_path, monkeypatch):
+        monkeypatch.setattr("media_analyzer.scanner._probe_worker", _crashing_probe)
+        monkeypatch.setattr(os, "cpu_count", lambda: 2)
+        for name in ("a", "b", "crash", "c", "d"):
+            _touch(tmp_path / f"{name}.mp4")
+
+        config = {"scan_dirs": [str(tmp_path)], "file_extensions": {"video": [".mp4"]}}
+        run_scan(db, config)
+
+        files = db.list_files(sort="filename")["files"]
+        assert [f["filename"] for f in files] == ["a.mp4", "b.mp4", "c.mp4", "d.mp4"]
+        assert db.get_scan_stats()["last_scan"]["status"] == "completed"
+
+    def test_cancel_drops_queued_probes(self, db, tmp_path, monkeypatch):
+        calls = []
+
+        def probe(file_path, category):
+            calls.append(file_path)
+            scan_progress.cancel_requested = True
+            time.sleep(0.01)
+            return _fake_probe(file_path, category)
+
+        monkeypatch.setattr("media_analyzer.scanner._probe_worker", probe)
+        for i in range(20):
+            _touch(tmp_path / f"film{i}.mp4")
+
+        self._scan(db, tmp_path)
+        assert len(calls) < 20
+        assert not scan_progress.running
+        assert not scan_progress.cancel_requested